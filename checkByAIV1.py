@@ -1,15 +1,39 @@
 import os
-import json
+import codecs
+import argparse
+import hashlib
 import time
 import re
+import json
+import random
+import string
 import logging
-import tempfile
+import threading
 import asyncio
 import aiohttp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+import orjson
+
+try:
+    import uvloop  # optional: faster event loop on Linux/macOS
+except ImportError:
+    uvloop = None
+
+try:
+    import aiodns  # optional: lets aiohttp resolve DNS without a thread
+except ImportError:
+    aiodns = None
+
+try:
+    import fastjsonschema  # optional: compiled validation of review responses
+except ImportError:
+    fastjsonschema = None
+
 # === Configuration ===
 FOLDER = Path(r"mcq_json/")  # update to your folder
 DEEPSEEK_API_URL = os.environ.get("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
@@ -19,28 +43,68 @@ MAX_CONCURRENT = 10  # Deepseek can handle 10 concurrent requests
 RATE_LIMIT_SECONDS = 0.1  # small pause between retries to avoid bursts
 MAX_RETRIES = 4
 BACKOFF_FACTOR = 1.5
+MAX_BACKOFF = 60  # seconds; cap on a single retry delay
 REQUEST_TIMEOUT = 120  # seconds
+LATENCY_TARGET = 60  # seconds; slower calls shrink the concurrency window
+BREAKER_THRESHOLD = 5  # consecutive failures before pausing all requests
+BREAKER_COOLDOWN = 30  # seconds to pause once the breaker trips
+BATCH_CHAR_BUDGET = 60_000  # max serialized MCQ bytes packed into one request
+MIN_BATCH_CHAR_BUDGET = 10_000  # floor for the adaptive batch budget
+MAX_BATCH_RECORDS = 4  # max files per request, so the reviews fit the model's output limit
+MAX_OUTPUT_TOKENS = 8192  # deepseek-chat's output limit; its default of 4K cuts batched replies short
+PACK_LOOKAHEAD = 32  # queued records the batcher looks past for one that still fits
+WRITE_BATCH = 32  # max reviews drained from the queue per writer round
+WRITE_WORKERS = 4  # threads that save reviews to disk
+READ_WORKERS = 16  # threads that read input files before the first request
+CACHE_DIR = FOLDER / ".review_cache"  # reviews of unchanged input, keyed by content hash
+FSYNC_WRITES = False  # fsync each review before the rename (slower, survives power loss)
+VALIDATION_RETRIES = 1  # extra requests for reviews that come back in the wrong shape
 
 # === Logging ===
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 logger = logging.getLogger("deepseek_async")
 
 # === Helpers ===
+_SAFE_FN_RE = re.compile(r"[^\w\-_. ]")
+_SAFE_ASCII = set(string.ascii_letters + string.digits + "-_. ")
+_SAFE_ASCII_TABLE = str.maketrans({c: "_" for c in map(chr, range(128)) if c not in _SAFE_ASCII})
+
 def safe_filename(name: str) -> str:
-    name = re.sub(r"[^\w\-_. ]", "_", name)
+    if name.isascii():
+        name = name.translate(_SAFE_ASCII_TABLE)
+    else:
+        # \w keeps non-ASCII letters, which the ASCII table cannot express
+        name = _SAFE_FN_RE.sub("_", name)
     name = name.strip().replace(" ", "_")
     return name[:200]
 
 def atomic_write(path: Path, data: Any):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=str(path.parent)) as tmp:
-        json.dump(data, tmp, indent=2, ensure_ascii=False)
-        tmp_name = tmp.name
-    os.replace(tmp_name, str(path))
+    # path.parent must already exist; process_files_async creates the output dirs once
+    # Serialize first so a bad payload never leaves a stray temp file behind
+    body = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    # Unique per writer thread; the bytes go straight to the fd with no buffered file object
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        try:
+            view = memoryview(body)
+            while view:
+                view = view[os.write(fd, view):]
+            if FSYNC_WRITES:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        # a failed write (disk full, rename refused) must not leave the temp file behind
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
 
-def build_payload(disease: str, source_filename: str, mcqs: list) -> Dict[str, Any]:
-    # Create the system prompt - updated to be clearer
-    system_prompt = """You are an expert pediatric surgery reviewer. You will receive a JSON object containing MCQs for one disease.
+# === Prompts ===
+SYSTEM_PROMPT = """You are an expert pediatric surgery reviewer. You will receive a JSON object containing MCQs for one disease.
 
 The MCQs will be provided in this format:
 {
@@ -115,6 +179,23 @@ Return the response in the following JSON format:
     "confidence": "number 0-1"
 }"""
 
+# SYSTEM_PROMPT stays first so single and batched requests share a byte-identical
+# prefix, which DeepSeek's prompt cache can reuse across both
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+BATCH MODE: You will receive a JSON object of the form {"batches": [...]} where every element is one disease record in the format described above. Review each record independently, exactly as if it had been sent on its own.
+
+Return **only** a single JSON object of the form {"reviews": [...]} with one review per record, in the same order as "batches". Every review must follow the review format described above and must repeat the record's "source_filename".
+"""
+
+# Built once and shared by every request
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+BATCH_SYSTEM_MESSAGE = {"role": "system", "content": BATCH_SYSTEM_PROMPT}
+
+# Payload builders return the serialized request body, so the intermediate
+# user-message str is dropped before the request goes out
+
+def build_payload(disease: str, source_filename: str, mcqs: list) -> bytes:
     # Create the user message with explicit structure
     user_message = {
         "disease": disease,
@@ -122,27 +203,97 @@ Return the response in the following JSON format:
         "mcqs": mcqs
     }
     
-    return {
+    return orjson.dumps({
         "model": MODEL,
         "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": json.dumps(user_message, ensure_ascii=False)}
+            SYSTEM_MESSAGE,
+            {"role": "user", "content": orjson.dumps(user_message).decode()}
         ],
+        "max_tokens": MAX_OUTPUT_TOKENS,
         "response_format": {"type": "json_object"}
-    }
+    })
+
+def build_batch_payload(records: List[Dict[str, Any]]) -> bytes:
+    """Pack several {disease, source_filename, mcqs} records into one request."""
+    return orjson.dumps({
+        "model": MODEL,
+        "messages": [
+            BATCH_SYSTEM_MESSAGE,
+            {"role": "user", "content": orjson.dumps({"batches": records}).decode()}
+        ],
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "response_format": {"type": "json_object"}
+    })
+
+# Shape of the review requested by SYSTEM_PROMPT. Only the core fields are required
+# and types are kept loose, since the model is not strict about e.g. numbers vs strings
+REVIEW_SCHEMA = {
+    "type": "object",
+    "required": ["disease", "source_filename", "quality", "confidence"],
+    "properties": {
+        "disease": {"type": ["string", "null"]},
+        "source_filename": {"type": "string"},
+        "accuracy_summary": {"type": "object"},
+        "spelling_grammar": {"type": "array"},
+        "quality": {"type": "object", "required": ["score"]},
+        "suggestions": {"type": "array"},
+        "improved_examples": {"type": "array"},
+        "confidence": {"type": ["number", "string"]},
+    },
+}
+
+_validate_review = fastjsonschema.compile(REVIEW_SCHEMA) if fastjsonschema else None
+
+_JSON_TYPES = {"object": dict, "array": list, "string": str, "number": (int, float),
+               "integer": int, "boolean": bool, "null": type(None)}
+
+def matches_schema(value: Any, schema: Dict[str, Any]) -> bool:
+    """Check `value` against the parts of JSON Schema that REVIEW_SCHEMA uses
+    (type, required, properties), so a reply passes or fails the same way
+    whether or not fastjsonschema is installed."""
+    types = schema.get("type")
+    if types is not None:
+        types = [types] if isinstance(types, str) else types
+        # JSON Schema doesn't count true/false as numbers
+        if not any(isinstance(value, _JSON_TYPES[t])
+                   and (t == "boolean" or not isinstance(value, bool)) for t in types):
+            return False
+    if isinstance(value, dict):
+        if any(k not in value for k in schema.get("required", ())):
+            return False
+        return all(matches_schema(value[k], sub)
+                   for k, sub in schema.get("properties", {}).items() if k in value)
+    return True
 
 def validate_response(resp_json: Any) -> bool:
-    return isinstance(resp_json, dict)
+    if _validate_review is None:
+        return matches_schema(resp_json, REVIEW_SCHEMA)
+    try:
+        _validate_review(resp_json)
+        return True
+    except fastjsonschema.JsonSchemaException:
+        return False
 
-def extract_json_from_response(response_content: str) -> Any:
-    """Extract JSON from DeepSeek response"""
+def extract_json_from_response(raw: bytes) -> Any:
+    """Extract JSON from a raw DeepSeek response body"""
+    # One pass over the envelope, one over the review inside it
+    api_response = orjson.loads(raw)
+    # DeepSeek caches shared prompt prefixes automatically and reports the hit here
+    usage = api_response.get("usage") or {}
+    if "prompt_cache_hit_tokens" in usage:
+        logger.info("Prompt cache: %s hit / %s miss tokens",
+                    usage["prompt_cache_hit_tokens"], usage.get("prompt_cache_miss_tokens"))
+    choice = api_response.get("choices", [{}])[0]
+    if choice.get("finish_reason") == "length":
+        logger.warning("Response cut off at %d tokens", MAX_OUTPUT_TOKENS)
+    response_content = choice.get("message", {}).get("content", "")
     try:
         if not response_content:
             return None
         
         # Try to parse the content as JSON
-        return json.loads(response_content)
-    except json.JSONDecodeError:
+        return orjson.loads(response_content)
+    except orjson.JSONDecodeError:
         # If it's not valid JSON, return the raw content
         logger.warning("Response content is not valid JSON")
         return response_content
@@ -150,32 +301,158 @@ def extract_json_from_response(response_content: str) -> Any:
         logger.error("Error extracting JSON from response: %s", e)
         return None
 
+# === Adaptive concurrency (AIMD) ===
+class AdaptiveLimiter:
+    """Concurrency gate whose size follows additive-increase/multiplicative-decrease.
+
+    Each success grows the window by `alpha` (up to `cmax`); throttling, server
+    errors or slow responses multiply it by `beta` (down to `cmin`). After
+    BREAKER_THRESHOLD consecutive failures all callers pause for BREAKER_COOLDOWN.
+    """
+
+    def __init__(self, cmax: int, cmin: int = 1, alpha: float = 0.5, beta: float = 0.5):
+        self.cmax = cmax
+        self.cmin = cmin
+        self.alpha = alpha
+        self.beta = beta
+        self.current = float(cmax)
+        self.in_flight = 0
+        self.failures = 0
+        self.pause_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.current))
+            self.in_flight += 1
+        delay = self.pause_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        self.failures = 0
+        if latency > LATENCY_TARGET:
+            self._decrease()
+        else:
+            self.current = min(self.cmax, self.current + self.alpha)
+
+    def on_error(self, status: Any = None) -> None:
+        self._decrease()
+        self.failures += 1
+        if self.failures >= BREAKER_THRESHOLD:
+            logger.warning("%d consecutive failures (last: %s), pausing requests for %ds",
+                           self.failures, status, BREAKER_COOLDOWN)
+            self.pause(BREAKER_COOLDOWN)
+            self.failures = 0
+
+    def on_headers(self, headers) -> None:
+        """Honour Retry-After and pre-pause when <10% of the request quota remains."""
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                self.pause(float(retry_after))
+            except ValueError:
+                pass
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        limit = headers.get("x-ratelimit-limit-requests")
+        if remaining and limit:
+            try:
+                if int(remaining) < 0.1 * int(limit):
+                    self.pause(RATE_LIMIT_SECONDS * self.cmax)
+            except ValueError:
+                pass
+
+    def pause(self, seconds: float) -> None:
+        self.pause_until = max(self.pause_until, time.monotonic() + seconds)
+
+    def _decrease(self) -> None:
+        self.current = max(self.cmin, self.current * self.beta)
+
+# === Request batching ===
+class Batcher:
+    """First-fit packer handing out batches of review records under a character budget.
+
+    Records are taken in order; one that does not fit is left queued while
+    smaller records behind it fill the remaining room. The search for those
+    stops after PACK_LOOKAHEAD misses or once less than 1/20 of the budget is
+    left, so handing out a batch never rescans the whole queue. A batch holds
+    at most MAX_BATCH_RECORDS records, since every record adds a full review
+    to the reply. The budget follows observed latency: a batch slower than
+    LATENCY_TARGET halves it (down to MIN_BATCH_CHAR_BUDGET), a fast one grows
+    it by a quarter (up to BATCH_CHAR_BUDGET). A record larger than the budget
+    goes out alone.
+    """
+
+    def __init__(self, items: List[tuple]):
+        self.pending = deque(items)  # (path, record, size, cache_key, out_path)
+        self.budget = BATCH_CHAR_BUDGET
+
+    def next_batch(self) -> List[tuple]:
+        batch = []
+        skipped = []
+        used = 0
+        nearly_full = self.budget - self.budget // 20
+        while (self.pending and used < nearly_full and len(batch) < MAX_BATCH_RECORDS
+               and len(skipped) < PACK_LOOKAHEAD):
+            item = self.pending.popleft()
+            if batch and used + item[2] > self.budget:
+                skipped.append(item)
+                continue
+            batch.append(item)
+            used += item[2]
+        # Records that did not fit keep their place at the front of the queue
+        self.pending.extendleft(reversed(skipped))
+        return batch
+
+    def on_latency(self, latency: float) -> None:
+        if latency > LATENCY_TARGET:
+            self.budget = max(MIN_BATCH_CHAR_BUDGET, self.budget // 2)
+        else:
+            self.budget = min(BATCH_CHAR_BUDGET, self.budget + self.budget // 4)
+
 # === Async API call with retries ===
-async def call_deepseek_with_retries(session: aiohttp.ClientSession, payload: Dict[str, Any], 
-                                      fname: str, semaphore: asyncio.Semaphore) -> Any:
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
+def retry_after_seconds(headers) -> float:
+    """Seconds the server asked us to wait via Retry-After, or 0."""
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except ValueError:
+        return 0.0
+
+def backoff_delay(attempt: int, floor: float = 0.0) -> float:
+    """Capped exponential backoff with jitter so workers do not retry in lockstep."""
+    delay = min(MAX_BACKOFF, BACKOFF_FACTOR ** attempt)
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    return max(floor, delay) + random.uniform(0, RATE_LIMIT_SECONDS)
+
+async def call_deepseek_with_retries(session: aiohttp.ClientSession, data: bytes, 
+                                      fname: str, limiter: AdaptiveLimiter) -> Any:
+    # `data` is the serialized payload; every retry posts the same bytes
     attempt = 0
     while attempt <= MAX_RETRIES:
         try:
-            # Use semaphore to limit concurrency
-            async with semaphore:
+            # Use the adaptive limiter to bound concurrency
+            async with limiter:
+                start_time = time.monotonic()
                 async with session.post(
                     DEEPSEEK_API_URL, 
-                    headers=headers, 
-                    json=payload, 
-                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+                    data=data
                 ) as response:
+                    limiter.on_headers(response.headers)
                     
                     # Check for HTTP errors
                     if response.status >= 400:
-                        # Retry on server errors (5xx)
-                        if 500 <= response.status < 600 and attempt < MAX_RETRIES:
+                        if response.status == 429 or response.status >= 500:
+                            limiter.on_error(response.status)
+                        # Retry on throttling (429) and server errors (5xx)
+                        if (response.status == 429 or 500 <= response.status < 600) and attempt < MAX_RETRIES:
                             attempt += 1
-                            sleep_time = (BACKOFF_FACTOR ** attempt) + RATE_LIMIT_SECONDS
+                            sleep_time = backoff_delay(attempt, retry_after_seconds(response.headers))
                             logger.warning("Server error %s for %s, retry %d/%d after %.1fs", 
                                          response.status, fname, attempt, MAX_RETRIES, sleep_time)
                             await asyncio.sleep(sleep_time)
@@ -191,13 +468,19 @@ async def call_deepseek_with_retries(session: aiohttp.ClientSession, payload: Di
                             message=f"HTTP {response.status}"
                         )
                     
-                    # Parse JSON response
-                    return await response.json()
+                    # Raw body; parsed once by extract_json_from_response
+                    body = await response.read()
+                    limiter.on_success(time.monotonic() - start_time)
+                    return body
                     
+        except aiohttp.ClientResponseError:
+            # Client errors (and 429/5xx out of retries) were logged above
+            raise
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            limiter.on_error(type(e).__name__)
             if attempt < MAX_RETRIES:
                 attempt += 1
-                sleep_time = (BACKOFF_FACTOR ** attempt) + RATE_LIMIT_SECONDS
+                sleep_time = backoff_delay(attempt)
                 logger.warning("Network error for %s, retry %d/%d after %.1fs: %s", 
                              fname, attempt, MAX_RETRIES, sleep_time, str(e))
                 await asyncio.sleep(sleep_time)
@@ -211,15 +494,32 @@ async def call_deepseek_with_retries(session: aiohttp.ClientSession, payload: Di
     # Should not reach here
     raise Exception(f"Max retries exceeded for {fname}")
 
+# === Review cache ===
+def cache_key(record: Dict[str, Any]) -> str:
+    """Hash of everything that determines a review: model, prompt and the MCQ record."""
+    digest = hashlib.sha256(MODEL.encode())
+    digest.update(SYSTEM_PROMPT.encode())
+    digest.update(orjson.dumps(record))
+    return digest.hexdigest()
+
+def load_cached_review(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        return orjson.loads((CACHE_DIR / f"{key}.json").read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    # Only clean reviews are worth replaying; errors and raw text should be retried
+    return "error" not in result and "raw_response" not in result
+
 # === Async Worker ===
-async def process_file_async(session: aiohttp.ClientSession, path: Path, 
-                            semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+def read_review_input(path: Path) -> Dict[str, Any]:
+    """Load one MCQ file as a review record, or return an error result for it."""
     fname = path.name
     logger.info("Starting async processing of %s", fname)
     
     try:
-        with path.open("r", encoding="utf-8") as fh:
-            data = json.load(fh)
+        data = orjson.loads(path.read_bytes().removeprefix(codecs.BOM_UTF8))
     except Exception as e:
         logger.error("Skipping %s: failed to read JSON (%s)", fname, e)
         return {"disease": None, "source_filename": fname, "error": f"read_error: {e}"}
@@ -233,94 +533,320 @@ async def process_file_async(session: aiohttp.ClientSession, path: Path,
         logger.warning("No MCQs found in %s!", fname)
         return {"disease": disease, "source_filename": fname, "error": "No MCQs found"}
     
-    payload = build_payload(disease, fname, mcqs)
+    return {"disease": disease, "source_filename": fname, "mcqs": mcqs}
+
+def review_path(disease: Optional[str], path: Path) -> Path:
+    """Where the review of input `path` about `disease` is saved.
+
+    `disease` is the one read from the input file, never the model's reply,
+    so the skip check and the writer always agree on the name.
+    """
+    return FOLDER / f"review_{safe_filename(disease or path.stem)}.json"
+
+def is_up_to_date(out_path: Path, path: Path) -> bool:
+    """True when `out_path` holds a clean review newer than the input `path`.
+
+    Failed results (API errors, raw responses) are saved too; those don't
+    count, so the file is reviewed again on the next run.
+    """
+    try:
+        if out_path.stat().st_mtime < path.stat().st_mtime:
+            return False
+        saved = orjson.loads(out_path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return False
+    return isinstance(saved, dict) and is_cacheable(saved) and validate_response(saved)
+
+def prepare_review_input(path: Path, use_cache: bool, skip_done: bool) -> tuple:
+    """Read `path` and check the cache; returns (path, record, cache_key, done, out_path).
+
+    `done` is True when `record` is already the final result (a read error or
+    a cached review) and no API call is needed. `record` is None when the file
+    was reviewed on an earlier run and `skip_done` is set. `out_path` is where
+    the review of `path` is saved.
+    """
+    record = read_review_input(path)
+    out_path = review_path(record["disease"], path)
+    if "error" in record:
+        return path, record, None, True, out_path
+    if skip_done and is_up_to_date(out_path, path):
+        logger.info("Already processed %s", path.name)
+        return path, None, None, True, out_path
+    key = cache_key(record) if use_cache else None
+    cached = load_cached_review(key) if key else None
+    if cached is not None:
+        logger.info("Using cached review for %s", path.name)
+        return path, cached, None, True, out_path
+    return path, record, key, False, out_path
+
+def read_all_inputs(files: List[Path], use_cache: bool, skip_done: bool) -> List[tuple]:
+    """prepare_review_input for every file, READ_WORKERS at a time, in file order."""
+    with ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="review-reader") as pool:
+        return list(pool.map(prepare_review_input, files,
+                             [use_cache] * len(files), [skip_done] * len(files)))
+
+EMPTY_RESPONSE = "Empty response from API"  # error of a review the reply did not contain
+
+def normalize_review(result: Any, disease: str, fname: str) -> Dict[str, Any]:
+    """Turn one parsed review into the dict that gets saved for `fname`."""
+    if result is None:
+        logger.warning("Empty response for %s", fname)
+        return {"disease": disease, "source_filename": fname, "error": EMPTY_RESPONSE}
+        
+    # If the response is a string (not JSON), convert it to a dict
+    if isinstance(result, str):
+        result = {"disease": disease, "source_filename": fname, "raw_response": result}
+    elif isinstance(result, dict):
+        # Ensure disease and source_filename are included
+        if "disease" not in result:
+            result["disease"] = disease
+        if "source_filename" not in result:
+            result["source_filename"] = fname
+
+    # Validate and return
+    if not validate_response(result):
+        logger.warning("Unexpected response shape for %s; saving raw response", fname)
+        return {"disease": disease, "source_filename": fname, "raw_response": result}
+
+    return result
+
+def salvage_reviews(text: str) -> Optional[List[Any]]:
+    """The complete reviews at the start of a {"reviews": [...]} reply that was cut short."""
+    key = text.find('"reviews"')
+    start = text.find("[", key) if key >= 0 else -1
+    if start < 0:
+        return None
+    decoder = json.JSONDecoder()
+    reviews = []
+    pos = start + 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        try:
+            review, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return reviews
+        reviews.append(review)
+
+def split_batch_review(result: Any, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Route the reviews of a batched response back to their source records.
+
+    A reply that was cut short keeps the reviews it finished; the records
+    after them come back empty, so review_batch asks for them again singly.
+    """
+    if isinstance(result, str):
+        salvaged = salvage_reviews(result)
+        if salvaged is not None:
+            logger.warning("Batched response is incomplete; kept %d of %d reviews",
+                           len(salvaged), len(records))
+            result = {"reviews": salvaged}
+    reviews = result.get("reviews") if isinstance(result, dict) else None
+    if not isinstance(reviews, list):
+        logger.warning("Batched response has no reviews list; saving raw response for each file")
+        return [{"disease": r["disease"], "source_filename": r["source_filename"], "raw_response": result}
+                for r in records]
+
+    by_name = {rv.get("source_filename"): rv for rv in reviews if isinstance(rv, dict)}
+    positional = len(reviews) == len(records)
+    split = []
+    for i, record in enumerate(records):
+        review = by_name.get(record["source_filename"])
+        if review is None and positional:
+            review = reviews[i]
+        split.append(normalize_review(review, record["disease"], record["source_filename"]))
+    return split
+
+def needs_retry(result: Dict[str, Any]) -> bool:
+    """A review that came back in the wrong shape, or not at all."""
+    return "raw_response" in result or result.get("error") == EMPTY_RESPONSE
+
+async def review_batch(session: aiohttp.ClientSession, batch: List[tuple], 
+                       limiter: AdaptiveLimiter) -> List[Dict[str, Any]]:
+    """Review a batch of records, asking again for reviews that fail validation.
+
+    Retries go one record per request: a batched reply that was cut short or
+    malformed would most likely fail the same way if sent again whole.
+    """
+    records = [item[1] for item in batch]
+    results = await request_reviews(session, records, limiter)
+    for _ in range(VALIDATION_RETRIES):
+        invalid = [i for i, r in enumerate(results) if needs_retry(r)]
+        if not invalid:
+            break
+        logger.warning("Retrying %d review(s) that failed validation", len(invalid))
+        retried = await asyncio.gather(*(request_reviews(session, [records[i]], limiter)
+                                         for i in invalid))
+        for i, (result,) in zip(invalid, retried):
+            results[i] = result
+    return results
+
+async def request_reviews(session: aiohttp.ClientSession, records: List[Dict[str, Any]],
+                          limiter: AdaptiveLimiter) -> List[Dict[str, Any]]:
+    """Send one request for `records` and return a result per record."""
+    names = ", ".join(r["source_filename"] for r in records)
+    if len(records) == 1:
+        record = records[0]
+        payload = build_payload(record["disease"], record["source_filename"], record["mcqs"])
+    else:
+        payload = build_batch_payload(records)
     
     try:
-        logger.info("Making async API call for %s", fname)
+        logger.info("Making async API call for %s", names)
         start_time = time.time()
-        api_response = await call_deepseek_with_retries(session, payload, fname, semaphore)
+        raw = await call_deepseek_with_retries(session, payload, names, limiter)
         elapsed = time.time() - start_time
-        logger.info("Async API call completed for %s in %.2f seconds", fname, elapsed)
+        logger.info("Async API call completed for %s in %.2f seconds", names, elapsed)
         
         # Extract the actual JSON content from the API response
-        content = api_response.get("choices", [{}])[0].get("message", {}).get("content", "")
-        result = extract_json_from_response(content)
-        
-        if result is None:
-            logger.warning("Empty response for %s", fname)
-            return {"disease": disease, "source_filename": fname, "error": "Empty response from API"}
-            
-        # If the response is a string (not JSON), convert it to a dict
-        if isinstance(result, str):
-            result = {"disease": disease, "source_filename": fname, "raw_response": result}
-        else:
-            # Ensure disease and source_filename are included
-            if "disease" not in result:
-                result["disease"] = disease
-            if "source_filename" not in result:
-                result["source_filename"] = fname
-                
+        result = extract_json_from_response(raw)
     except Exception as e:
-        logger.exception("Async API call failed for %s", fname)
-        return {"disease": disease, "source_filename": fname, "error": str(e)}
+        logger.exception("Async API call failed for %s", names)
+        return [{"disease": r["disease"], "source_filename": r["source_filename"], "error": str(e)}
+                for r in records]
 
-    # Validate and return
-    if not validate_response(result):
-        logger.warning("Unexpected response type for %s; saving raw response", fname)
-        return {"disease": disease, "source_filename": fname, "raw_response": result}
+    if len(records) == 1:
+        return [normalize_review(result, records[0]["disease"], records[0]["source_filename"])]
+    return split_batch_review(result, records)
 
-    return result
+def save_review(path: Path, out_path: Path, result: Dict[str, Any], key: Optional[str] = None) -> None:
+    """Write the review for `path` to `out_path`; with a cache `key`, also store it for reruns."""
+    fname = path.name
+    out_name = out_path.name
+
+    # Save result atomically
+    try:
+        atomic_write(out_path, result)
+        logger.info("Saved review for %s -> %s", fname, out_name)
+        if key and is_cacheable(result):
+            atomic_write(CACHE_DIR / f"{key}.json", result)
+    except Exception as e:
+        logger.exception("Failed to write review for %s: %s", fname, e)
+
+async def review_writer(queue: asyncio.Queue) -> None:
+    """Save finished reviews off the event loop, draining up to WRITE_BATCH at a time.
+
+    Saves run on their own WRITE_WORKERS threads so they never queue behind
+    other to_thread work. A None item shuts the writer down once everything
+    queued before it is saved.
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS, thread_name_prefix="review-writer") as pool:
+        done = False
+        while not done:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while not queue.empty() and len(batch) < WRITE_BATCH:
+                item = queue.get_nowait()
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            await asyncio.gather(*(loop.run_in_executor(pool, save_review, *item) for item in batch))
 
 # === Async Main ===
-async def process_files_async(files: List[Path]) -> None:
-    # Create semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+async def process_files_async(files: List[Path], use_cache: bool = True,
+                              skip_done: bool = True) -> None:
+    # Adaptive limiter starts at MAX_CONCURRENT and backs off under throttling
+    limiter = AdaptiveLimiter(MAX_CONCURRENT)
+
+    # Output directories are created here once rather than on every write
+    FOLDER.mkdir(parents=True, exist_ok=True)
+    if use_cache:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Reviews are saved by a dedicated writer so disk I/O overlaps the API calls
+    writer_q: asyncio.Queue = asyncio.Queue()
+    writer_task = asyncio.create_task(review_writer(writer_q))
+    try:
+        await review_all(files, use_cache, skip_done, limiter, writer_q)
+    finally:
+        # Even when reviewing fails part way, everything already queued is saved
+        await writer_q.put(None)
+        await writer_task
+
+async def review_all(files: List[Path], use_cache: bool, skip_done: bool,
+                     limiter: AdaptiveLimiter, writer_q: asyncio.Queue) -> None:
+    """Read `files`, review the ones that need it and queue every result on `writer_q`."""
+    # Read every file up front so small ones can be packed into shared requests.
+    # A fixed pool does the reads so there is no task per file; map keeps file order
+    prepared = await asyncio.to_thread(read_all_inputs, files, use_cache, skip_done)
+    pending = []
+    for path, record, key, done, out_path in prepared:
+        if record is None:
+            continue
+        if done:
+            writer_q.put_nowait((path, out_path, record, None))
+        else:
+            pending.append((path, record, len(orjson.dumps(record)), key, out_path))
+    batcher = Batcher(pending)
     
     # Create a shared session for connection pooling
-    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT, force_close=True)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        # Create tasks for all files
-        tasks = []
-        for path in files:
-            task = asyncio.create_task(process_file_async(session, path, semaphore))
-            tasks.append((task, path))
-        
-        # Process results as they complete
-        for task, path in tasks:
-            try:
-                result = await task
-                fname = path.name
-                
-                # Determine output filename
-                disease_name = result.get("disease") or path.stem
-                out_name = f"review_{safe_filename(disease_name)}.json"
-                out_path = FOLDER / out_name
-
-                # Save result atomically
+    # Keep-alive pool: connections (and their TLS sessions) are reused across requests
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT,
+        limit_per_host=MAX_CONCURRENT,
+        keepalive_timeout=75,
+        ttl_dns_cache=600,
+        enable_cleanup_closed=True,
+        resolver=aiohttp.AsyncResolver() if aiodns else None,
+    )
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    headers = {
+        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        async def worker():
+            while True:
+                batch = batcher.next_batch()
+                if not batch:
+                    return
                 try:
-                    atomic_write(out_path, result)
-                    logger.info("Saved review for %s -> %s", fname, out_name)
-                except Exception as e:
-                    logger.exception("Failed to write review for %s: %s", fname, e)
-                    
-            except Exception as e:
-                logger.exception("Unhandled exception processing %s", path.name)
+                    start_time = time.monotonic()
+                    results = await review_batch(session, batch, limiter)
+                    batcher.on_latency(time.monotonic() - start_time)
+                    for (path, _, _, key, out_path), result in zip(batch, results):
+                        await writer_q.put((path, out_path, result, key))
+                except Exception:
+                    logger.exception("Unhandled exception processing %s",
+                                     ", ".join(item[0].name for item in batch))
+
+        # Each worker keeps pulling the next batch until every file is reviewed
+        await asyncio.gather(*(worker() for _ in range(MAX_CONCURRENT)))
 
 # === Main entry point ===
 def main():
+    parser = argparse.ArgumentParser(description="Review MCQ JSON files with the DeepSeek API")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached reviews and call the API for every file")
+    parser.add_argument("--redo", action="store_true",
+                        help="Review files again even if their review is newer than the input")
+    args = parser.parse_args()
+
     if not FOLDER.exists() or not FOLDER.is_dir():
         logger.error("Folder does not exist: %s", FOLDER)
         return
 
-    files = sorted([p for p in FOLDER.iterdir() if p.suffix.lower() == ".json"])
+    # DirEntry.is_file() uses the d_type from readdir, so no stat per entry
+    with os.scandir(FOLDER) as it:
+        # review_*.json are this script's own outputs, not MCQ files
+        files = sorted(Path(e.path) for e in it
+                       if e.name.lower().endswith(".json") and not e.name.startswith("review_")
+                       and e.is_file())
     if not files:
         logger.info("No JSON files found in folder: %s", FOLDER)
         return
     
     logger.info("Found %d JSON files to process with async concurrency (max %d)", len(files), MAX_CONCURRENT)
     
-    # Run async event loop
-    asyncio.run(process_files_async(files))
+    # Run async event loop (uvloop's when available)
+    run = process_files_async(files, use_cache=not args.no_cache, skip_done=not args.redo)
+    if uvloop is not None:
+        uvloop.run(run)
+    else:
+        asyncio.run(run)
     
     logger.info("All files processed asynchronously.")
 
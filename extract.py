@@ -1,6 +1,7 @@
 import os
 import shutil
 import fnmatch
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------------------------------------
 # CONFIGURATION (edit these manually)
@@ -8,12 +9,30 @@ import fnmatch
 MAIN_FOLDER = r"mcq_json"
 IGNORE_PATTERN = "*review*"     # Example: ignore files containing "temp"
 # You can use wildcards: "*.txt", "*_backup.*", "*draft*"
+HARDLINK = False                # hardlink instead of copying (edits to a linked file show up in both places)
+COPY_WORKERS = 16               # threads used for the actual file copies
 
 
 # ---------------------------------------------
 # SCRIPT LOGIC
 # ---------------------------------------------
+def place_file(src_path, dst_path):
+    # A hardlink shares the data instead of copying it; fall back to a real copy
+    # across filesystems or where links are not supported
+    if HARDLINK:
+        try:
+            os.link(src_path, dst_path)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src_path, dst_path)
+
+
 def copy_files_ignoring_pattern(main_folder, ignore_pattern):
+    # Destinations are chosen serially so the rename-on-clash numbering stays
+    # deterministic; only the copies themselves run in parallel
+    pairs = []
+    taken = set()
     for root, dirs, files in os.walk(main_folder):
         # Skip the main folder itself
         if root == main_folder:
@@ -28,22 +47,26 @@ def copy_files_ignoring_pattern(main_folder, ignore_pattern):
             src_path = os.path.join(root, file)
             dst_path = os.path.join(main_folder, file)
 
-            # If a file with same name exists, rename to avoid overwrite
-            if os.path.exists(dst_path):
+            # If a file with same name exists (or is about to), rename to avoid overwrite
+            if dst_path in taken or os.path.exists(dst_path):
                 base, ext = os.path.splitext(file)
                 counter = 1
                 new_name = f"{base}_{counter}{ext}"
                 new_dst = os.path.join(main_folder, new_name)
 
-                while os.path.exists(new_dst):
+                while new_dst in taken or os.path.exists(new_dst):
                     counter += 1
                     new_name = f"{base}_{counter}{ext}"
                     new_dst = os.path.join(main_folder, new_name)
 
                 dst_path = new_dst
 
-            print(f"Copying: {src_path} → {dst_path}")
-            shutil.copy2(src_path, dst_path)
+            print(f"{'Linking' if HARDLINK else 'Copying'}: {src_path} → {dst_path}")
+            taken.add(dst_path)
+            pairs.append((src_path, dst_path))
+
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as ex:
+        list(ex.map(lambda pair: place_file(*pair), pairs))
 
 
 if __name__ == "__main__":
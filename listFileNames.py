@@ -1,5 +1,7 @@
 import os
-import json
+import posixpath
+
+import orjson
 
 # Get the directory where the script is located
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -67,8 +69,8 @@ output_data = {
 # Save to JSON file in the same directory
 output_file = os.path.join(current_dir, "file_list_output.json")
 
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(output_data, f, indent=4)
+with open(output_file, 'wb') as f:
+    f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
 
 print(f"\nSuccessfully saved {len(files)} file name(s) to:")
 print(f"   {output_file}")
@@ -90,25 +92,21 @@ if filter_choice == 'y':
             bad_dirs.add(dirname)
     
     # 2. Second Pass: Filter the list to exclude any file inside those directories
-    filtered_files = []
-    for f in files:
-        file_dir = os.path.dirname(f)
-        
-        # Check if this file's directory (or any parent directory) is in the bad_dirs list
-        is_in_bad_dir = False
-        for bd in bad_dirs:
-            # If bd is empty, it means a 'done_' file was found in the root
-            if bd == "":
-                if file_dir == "":
-                    is_in_bad_dir = True
-                    break
-            # Use os.sep to ensure "folder\file" matches "folder" + "\"
-            elif f.startswith(bd + os.sep) or f == bd:
-                is_in_bad_dir = True
-                break
-        
-        if not is_in_bad_dir:
-            filtered_files.append(f)
+    # Paths were normalized to '/', so walk each file's ancestors with posixpath
+    # and look them up in the set instead of comparing against every bad dir
+    def is_in_bad_dir(f):
+        d = posixpath.dirname(f)
+        # If "" is in bad_dirs, a 'done_' file was found in the root; that only
+        # excludes the other root-level files
+        if d == "":
+            return "" in bad_dirs
+        while d:
+            if d in bad_dirs:
+                return True
+            d = posixpath.dirname(d)
+        return False
+
+    filtered_files = [f for f in files if not is_in_bad_dir(f)]
     
     # Update output_data for the new JSON file
     output_data['files'] = filtered_files
@@ -117,8 +115,8 @@ if filter_choice == 'y':
     
     # Save to a new filtered JSON file
     filtered_output_file = os.path.join(current_dir, "filtered_file_list_output.json")
-    with open(filtered_output_file, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=4)
+    with open(filtered_output_file, 'wb') as f:
+        f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
     
     print(f"\nSuccessfully excluded folders containing '{pattern}' files.")
     print(f"Remaining files to work on: {len(filtered_files)}")
@@ -7,13 +7,22 @@ build_ordered_mcq_book_fixed.py
 - Also produces a DOCX file with the same content
 """
 
-import json
+import codecs
 import os
 import glob
 import re
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+
+import ijson
+import orjson
 from docx import Document
 from docx. shared import Pt, RGBColor, Inches
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 # --------------------------
@@ -33,6 +42,18 @@ SHOW_CHAPTER_SOURCE = False
 # Answer placement: "immediate", "chapter_end", "book_end"
 ANSWER_PLACEMENT = "immediate"
 
+# number of threads used to read chapter JSON files ahead of the builder
+LOAD_WORKERS = 16
+
+# max chapter files read (or being read) ahead of the one being written
+LOAD_AHEAD = LOAD_WORKERS * 2
+
+# chapter files above this size (bytes) are streamed MCQ by MCQ instead of loaded whole
+STREAM_THRESHOLD = 1 << 20
+
+# write buffer for the Markdown book (bytes)
+WRITE_BUFFER = 1 << 20
+
 # --------------------------
 # YAML metadata header
 # --------------------------
@@ -47,6 +68,26 @@ description: "A comprehensive collection of pediatric surgery MCQs organized by
 ---
 """
 
+# --------------------------
+# Markdown MCQ templates (one rendered block per question)
+# --------------------------
+OPT_TEMPLATE = "- {k}. {v}"
+Q_TEMPLATE = "### MCQ {n}:  {q}\n{opts}"
+ANSWER_TEMPLATE = "\n**Answer:** {a}{e}\n---\n"
+EXPLANATION_TEMPLATE = "\n**Explanation:** {e}\n"
+
+# option keys as they almost always appear; lets build_book skip sorting
+_CANON = ("A", "B", "C", "D", "E")
+
+# --------------------------
+# DOCX measurements and colours (built once, shared by every style)
+# --------------------------
+_PT3, _PT6, _PT8, _PT10, _PT11, _PT12 = Pt(3), Pt(6), Pt(8), Pt(10), Pt(11), Pt(12)
+_IN_HALF = Inches(0.5)
+_BLACK = RGBColor(0x00, 0x00, 0x00)
+_GREY = RGBColor(0xAA, 0xAA, 0xAA)
+_SEPARATOR_TEXT = "―" * 60  # Using a single em-dash character repeated
+
 # --------------------------
 # Helpers
 # --------------------------
@@ -57,6 +98,18 @@ def read_order_file(order_file):
         lines = [line.strip() for line in f if line.strip()]
     return lines
 
+_DIR_INDEX = None
+
+def _get_dir_index():
+    """Lowercase name -> real name for INPUT_FOLDER, listed once on first use."""
+    global _DIR_INDEX
+    if _DIR_INDEX is None:
+        _DIR_INDEX = {}
+        with os.scandir(INPUT_FOLDER) as it:
+            for e in it:
+                _DIR_INDEX.setdefault(e.name.lower(), e.name)
+    return _DIR_INDEX
+
 def find_file_in_input(candidate_name):
     """
     Given candidate from order.txt (with or without .json),
@@ -74,13 +127,12 @@ def find_file_in_input(candidate_name):
             return path_with_ext
     
     # Try case-insensitive search
-    candidate_lower = candidate_name.lower()
-    for f in os.listdir(INPUT_FOLDER):
-        if f.lower() == candidate_lower:
-            return os.path.join(INPUT_FOLDER, f)
-    
-    return None
+    hit = _get_dir_index().get(candidate_name.lower())
+    return os.path.join(INPUT_FOLDER, hit) if hit else None
+
+_NUM_PREFIX = re.compile(r"^\d+_+")
 
+@lru_cache(maxsize=None)
 def clean_source_display(filename):
     """Remove leading numeric prefix like '74_' and trailing . json/. JSON"""
     name = os.path.basename(filename)
@@ -88,35 +140,87 @@ def clean_source_display(filename):
     if name.lower().endswith(".json"):
         name = name[:-5]
     # remove leading numbers and underscore(s)
-    name = re.sub(r"^\d+_+", "", name)
+    name = _NUM_PREFIX.sub("", name)
     # Replace underscores with spaces and capitalize
     name = name.replace('_', ' ').replace(' mcqs', '').title()
     return name
 
+_SLUG_STRIP = re.compile(r'[^\w\s-]')
+
+@lru_cache(maxsize=None)
 def slugify(text):
     """Convert text to a URL-friendly slug."""
-    return re.sub(r'[^\w\s-]', '', text).strip().lower().replace(' ', '-')
+    return _SLUG_STRIP.sub('', text).strip().lower().replace(' ', '-')
 
 def load_json_file(file_path):
     """Load JSON file and return data."""
+    raw = Path(file_path).read_bytes()
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except UnicodeDecodeError:
-        with open(file_path, 'r', encoding='utf-8-sig') as f: # Handle BOM
-            return json.load(f)
-    except json.JSONDecodeError as e:
+        return orjson.loads(raw.removeprefix(codecs.BOM_UTF8)) # Handle BOM
+    except orjson.JSONDecodeError:
         print(f"  WARNING:  Skipping malformed JSON in {file_path}")
         return None
 
+# marker returned by load_chapter for files that iter_mcqs will stream later
+STREAMED = object()
+
+def load_chapter(file_path):
+    """Load a chapter file, deferring files above STREAM_THRESHOLD to iter_mcqs."""
+    if os.path.getsize(file_path) > STREAM_THRESHOLD:
+        return STREAMED
+    return load_json_file(file_path)
+
+def iter_mcqs(file_path):
+    """Yield the MCQs of a large chapter file one at a time."""
+    with open(file_path, 'rb') as f:
+        if f.read(3) != codecs.BOM_UTF8: # Handle BOM
+            f.seek(0)
+        try:
+            yield from ijson.items(f, 'mcqs.item')
+        except ijson.JSONError:
+            print(f"  WARNING:  Stopped at malformed JSON in {file_path}")
+
+def load_chapter_entry(file_path):
+    """Load worker: (display_src, disease, slug, data) for one chapter file.
+
+    The chapter names depend only on the filename, so the threads that read the
+    files derive them too and the build loop does no regex work of its own.
+    """
+    # Always derive the disease name from the filename for consistent ordering.
+    # (the optional source line shows it unstripped)
+    display_src = clean_source_display(file_path)
+    disease = display_src.strip()
+    return display_src, disease, slugify(disease), load_chapter(file_path)
+
+def load_chapters(file_paths):
+    """Yield load_chapter_entry() for each path, in order.
+
+    At most LOAD_AHEAD files are read ahead of the builder, so parsed chapters
+    never pile up in memory faster than they are written out.
+    """
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as ex:
+        window = deque()
+        for file_path in file_paths:
+            window.append(ex.submit(load_chapter_entry, file_path))
+            if len(window) >= LOAD_AHEAD:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+# One pass: leading/trailing *.-+ runs, or any internal *._ run
+_CLEAN_OPT = re.compile(r'^[\*\.\-\+]+|[\*\.\-\+]+$|[\*\._]+')
+# every character _CLEAN_OPT can remove; text with none of them skips the regex
+_CLEAN_OPT_CHARS = frozenset('*.-+_')
+
+# options repeat a lot ("All of the above"), and both the Markdown and DOCX passes clean them
+@lru_cache(maxsize=4096)
 def clean_option_text(option_text):
     """Clean option text by removing excessive formatting."""
-    # Remove any leading/trailing asterisks or periods
-    option_text = re. sub(r'^[\*\.\-\+]+', '', option_text)
-    option_text = re.sub(r'[\*\.\-\+]+$', '', option_text)
-    # Clean up internal formatting
-    option_text = re. sub(r'[\*\._]+', '', option_text)
-    return option_text. strip()
+    # Remove leading/trailing asterisks, periods, dashes or pluses
+    # and internal formatting characters in a single scan
+    if _CLEAN_OPT_CHARS.isdisjoint(option_text):
+        return option_text.strip()
+    return _CLEAN_OPT.sub('', option_text).strip()
 
 # --------------------------
 # DOCX Helpers
@@ -129,30 +233,63 @@ def create_docx_document():
     # Set up styles for professional medical book appearance
     style = doc.styles['Normal']
     style.font.name = 'Times New Roman'
-    style.font.size = Pt(11)
-    style.font.color.rgb = RGBColor(0x00, 0x00, 0x00)
+    style.font.size = _PT11
+    style.font.color.rgb = _BLACK
     
     # Set up heading styles
     h1_style = doc.styles['Heading 1']
     h1_style.font.name = 'Times New Roman'
     h1_style.font.size = Pt(18)
     h1_style.font.bold = True
-    h1_style.font.color.rgb = RGBColor(0x00, 0x00, 0x00)
+    h1_style.font.color.rgb = _BLACK
     
     h2_style = doc.styles['Heading 2']
     h2_style.font.name = 'Times New Roman'
     h2_style.font.size = Pt(14)
     h2_style.font.bold = True
-    h2_style.font.color. rgb = RGBColor(0x00, 0x00, 0x00)
+    h2_style.font.color. rgb = _BLACK
     
     h3_style = doc. styles['Heading 3']
     h3_style.font. name = 'Times New Roman'
-    h3_style.font.size = Pt(12)
+    h3_style.font.size = _PT12
     h3_style.font.bold = True
-    h3_style.font.color.rgb = RGBColor(0x00, 0x00, 0x00)
+    h3_style.font.color.rgb = _BLACK
+
+    # MCQ paragraph styles; add_question() etc. only reference these, so the
+    # font and spacing are stored once instead of on every run and paragraph
+    _add_mcq_style(doc, 'MCQQuestion', bold=True, space_before=_PT12, space_after=_PT6)
+    _add_mcq_style(doc, 'MCQOption', left_indent=_IN_HALF, space_after=_PT3)
+    _add_mcq_style(doc, 'MCQAnswer', left_indent=_IN_HALF, space_before=_PT6, space_after=_PT3)
+    _add_mcq_style(doc, 'MCQExplanation', left_indent=_IN_HALF, space_after=_PT12)
+    _add_mcq_style(doc, 'MCQSeparator', size=_PT10, color=_GREY,
+                   space_before=_PT8, space_after=_PT8)
+    _add_mcq_style(doc, 'TOCEntry', left_indent=_IN_HALF, space_after=_PT6)
+
+    # bold labels inside answer/explanation paragraphs reference one character style
+    label_style = doc.styles.add_style('MCQLabel', WD_STYLE_TYPE.CHARACTER)
+    label_style.font.bold = True
     
     return doc
 
+def _add_mcq_style(doc, name, size=_PT11, bold=False, color=None,
+                   left_indent=None, space_before=None, space_after=None):
+    """Add a Times New Roman paragraph style based on Normal."""
+    style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = doc.styles['Normal']
+    style.font.name = 'Times New Roman'
+    style.font.size = size
+    style.font.bold = bold
+    if color is not None:
+        style.font.color.rgb = color
+    fmt = style.paragraph_format
+    if left_indent is not None:
+        fmt.left_indent = left_indent
+    if space_before is not None:
+        fmt.space_before = space_before
+    if space_after is not None:
+        fmt.space_after = space_after
+    return style
+
 def add_heading(doc, text, level=1):
     """Add a heading to the DOCX document."""
     heading = doc.add_heading(text, level=level)
@@ -164,102 +301,69 @@ def add_toc(doc, toc_entries):
     toc_heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
     
     for disease, slug in toc_entries: 
-        paragraph = doc.add_paragraph()
-        paragraph.paragraph_format.left_indent = Inches(0.5)
-        paragraph.paragraph_format.space_after = Pt(6)
-        run = paragraph.add_run(f"• {disease}")
-        run.font.name = 'Times New Roman'
-        run.font.size = Pt(11)
+        doc.add_paragraph(f"• {disease}", style='TOCEntry')
     
     doc.add_page_break()
 
+def _add_styled_paragraph(doc, style_id):
+    """Append an empty <w:p> using paragraph style `style_id` straight to the body XML."""
+    p = doc.element.body.add_p()
+    p.style = style_id
+    return p
+
+def _add_text_run(p, text, char_style=None):
+    """Append a <w:r> holding `text`, optionally tagged with character style `char_style`."""
+    r = p.add_r()
+    if char_style:
+        r.style = char_style
+    r.text = text
+    return r
+
 def add_question(doc, mcq_number, question_text):
     """Add a question with professional formatting."""
-    para = doc.add_paragraph()
-    para.paragraph_format.space_before = Pt(12)
-    para.paragraph_format.space_after = Pt(6)
-    
-    # Question number in bold
-    run_num = para.add_run(f"Q {mcq_number}:  ")
-    run_num.font. name = 'Times New Roman'
-    run_num.font. size = Pt(11)
-    run_num.font.bold = True
-    
-    # Question text in bold
-    run_text = para. add_run(question_text)
-    run_text.font. name = 'Times New Roman'
-    run_text.font. size = Pt(11)
-    run_text.font.bold = True
+    # Question number and text, bold via the MCQQuestion style
+    p = _add_styled_paragraph(doc, "MCQQuestion")
+    _add_text_run(p, f"Q {mcq_number}:  {question_text}")
 
 def add_option(doc, option_letter, option_text):
     """Add an option with consistent formatting (no bold)."""
-    para = doc.add_paragraph()
-    para.paragraph_format.left_indent = Inches(0.5)
-    para.paragraph_format.space_after = Pt(3)
-    
-    # Option letter and period - NOT bold
-    run_letter = para.add_run(f"{option_letter}.  ")
-    run_letter.font.name = 'Times New Roman'
-    run_letter.font.size = Pt(11)
-    run_letter.font. bold = False
-    
-    # Option text - NOT bold
-    run_text = para.add_run(option_text)
-    run_text.font.name = 'Times New Roman'
-    run_text.font.size = Pt(11)
-    run_text.font. bold = False
+    p = _add_styled_paragraph(doc, "MCQOption")
+    _add_text_run(p, f"{option_letter}.  {option_text}")
 
 def add_answer(doc, answer_text):
     """Add answer with professional formatting."""
-    para = doc.add_paragraph()
-    para.paragraph_format.space_before = Pt(6)
-    para.paragraph_format.space_after = Pt(3)
-    para.paragraph_format.left_indent = Inches(0.5)
-    
-    # "Answer:" label in bold
-    run_label = para.add_run("Answer: ")
-    run_label.font.name = 'Times New Roman'
-    run_label. font.size = Pt(11)
-    run_label.font.bold = True
-    
-    # Answer text in regular font
-    run_text = para. add_run(answer_text)
-    run_text.font. name = 'Times New Roman'
-    run_text.font. size = Pt(11)
-    run_text.font.bold = False
+    # "Answer:" label in bold (MCQLabel), answer text in regular font
+    p = _add_styled_paragraph(doc, "MCQAnswer")
+    _add_text_run(p, "Answer: ", "MCQLabel")
+    _add_text_run(p, answer_text)
 
 def add_explanation(doc, explanation_text):
     """Add explanation with professional formatting."""
-    para = doc.add_paragraph()
-    para.paragraph_format.space_after = Pt(12)
-    para.paragraph_format.left_indent = Inches(0.5)
-    
-    # "Explanation:" label in bold
-    run_label = para. add_run("Explanation: ")
-    run_label.font. name = 'Times New Roman'
-    run_label.font. size = Pt(11)
-    run_label.font.bold = True
-    
-    # Explanation text in regular font
-    run_text = para.add_run(explanation_text)
-    run_text.font.name = 'Times New Roman'
-    run_text.font.size = Pt(11)
-    run_text.font.bold = False
+    # "Explanation:" label in bold (MCQLabel), explanation text in regular font
+    p = _add_styled_paragraph(doc, "MCQExplanation")
+    _add_text_run(p, "Explanation: ", "MCQLabel")
+    _add_text_run(p, explanation_text)
 
 def add_separator(doc):
     """Add a clean separator line between questions."""
-    para = doc.add_paragraph()
-    para.paragraph_format.space_before = Pt(8)
-    para.paragraph_format.space_after = Pt(8)
-    run = para.add_run("―" * 60)  # Using a single em-dash character repeated
-    run.font.name = 'Times New Roman'
-    run.font.size = Pt(10)
-    run.font.color.rgb = RGBColor(0xAA, 0xAA, 0xAA)
+    p = _add_styled_paragraph(doc, "MCQSeparator")
+    _add_text_run(p, _SEPARATOR_TEXT)
 
 # --------------------------
 # Build function
 # --------------------------
 
+def _emit_immediate(chapter_content, chapter_answers, book_answer_blocks, num, disease, q_text, block, ans, exp):
+    """Write the answer and explanation right under the question."""
+    exp_block = EXPLANATION_TEMPLATE.format(e=exp) if exp else ""
+    chapter_content.append(block + ANSWER_TEMPLATE.format(a=ans, e=exp_block))
+
+def _emit_deferred(chapter_content, chapter_answers, book_answer_blocks, num, disease, q_text, block, ans, exp):
+    """Write the question; keep its answer for the chapter and book answer keys."""
+    chapter_content.append(block + "\n")
+    chapter_answers.append((num, ans, exp))
+    book_answer_blocks.append((num, disease, q_text, ans, exp))
+
 def build_book():
     """Builds the MCQ book from JSON files based on the order specified in ORDER_FILE."""
     os.makedirs(INPUT_FOLDER, exist_ok=True)
@@ -270,7 +374,6 @@ def build_book():
     ordered_filenames = read_order_file(ORDER_FILE)
     print(f"Processing {len(ordered_filenames)} files from {ORDER_FILE}")
 
-    all_chapters = []
     all_chapters_data = []  # Store structured data for DOCX
     toc_entries = []
     mcq_counter = 1
@@ -278,107 +381,104 @@ def build_book():
     files_processed = 0
     files_skipped = 0
 
+    # Pick the per-question emitter once instead of branching on every MCQ
+    emit = _emit_immediate if ANSWER_PLACEMENT == "immediate" else _emit_deferred
+
+    resolved = []
     for listed in ordered_filenames:
         file_path = find_file_in_input(listed)
         if not file_path:
             print(f"WARNING: Listed file not found: {listed} (skipping)")
             files_skipped += 1
             continue
+        resolved.append(file_path)
 
-        data = load_json_file(file_path)
-        if data is None:
-            files_skipped += 1
-            continue
-
-        # Always derive the disease name from the filename for consistent ordering
-        disease = clean_source_display(file_path)
-        disease = disease.strip()
-        chapter_slug = slugify(disease)
-
-        print(f"✓ Processing:  {disease}")
-        files_processed += 1
+    # Chapter files are read concurrently, a bounded window ahead, in order.txt sequence
+    chapters = load_chapters(resolved)
 
-        chapter_content = []
-        chapter_answers = []
-        chapter_mcqs_data = []  # Store MCQs with their numbers
-
-        chapter_content.append(f"\n\n# {disease}\n")
-        if SHOW_CHAPTER_SOURCE: 
-            display_src = clean_source_display(os.path.basename(file_path))
-            chapter_content.append(f"*Chapter source file: `{display_src}`*\n")
-
-        toc_entries.append((disease, chapter_slug))
-
-        mcqs = data.get("mcqs", [])
-
-        for q in mcqs:
-            q_text = q.get("question", "").strip()
-            if not q_text:
-                print(f"  WARNING:  Skipping malformed MCQ in {file_path}")
+    # Pass 1: chapter bodies go to a scratch file so the Markdown never sits in memory
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as body:
+        for file_path, (display_src, disease, chapter_slug, data) in zip(resolved, chapters):
+            if data is None:
+                files_skipped += 1
                 continue
 
-            options = q.get("options", {})
-            ans = str(q.get("correct_answer", "")).strip()
-            exp = q.get("explanation", "").strip()
-
-            # Store structured data for DOCX
-            chapter_mcqs_data.append({
-                'number': mcq_counter,
-                'question': q_text,
-                'options': options,
-                'answer': ans,
-                'explanation':  exp
-            })
-
-            chapter_content.append(f"### MCQ {mcq_counter}:  {q_text}\n")
-            # Ensure options are sorted, typically A, B, C, D
-            for key in sorted(options.keys()):
-                option_text = clean_option_text(options[key])
-                chapter_content.append(f"- {key}. {option_text}")
-
-            if ANSWER_PLACEMENT == "immediate": 
-                chapter_content.append(f"\n**Answer:** {ans}")
-                if exp:
-                    chapter_content.append(f"\n**Explanation:** {exp}\n")
+            print(f"✓ Processing:  {disease}")
+            files_processed += 1
+
+            chapter_content = []
+            chapter_answers = []
+            chapter_mcqs_data = []  # Store MCQs with their numbers
+
+            chapter_content.append(f"\n\n# {disease}\n")
+            if SHOW_CHAPTER_SOURCE: 
+                chapter_content.append(f"*Chapter source file: `{display_src}`*\n")
+
+            toc_entries.append((disease, chapter_slug))
+
+            mcqs = iter_mcqs(file_path) if data is STREAMED else data.get("mcqs", [])
+
+            skipped = 0
+            for q in mcqs:
+                q_text = q.get("question", "").strip()
+                if not q_text:
+                    skipped += 1
+                    continue
+
+                options = q.get("options", {})
+                ans = str(q.get("correct_answer", "")).strip()
+                exp = q.get("explanation", "").strip()
+
+                # Ensure options are sorted, typically A, B, C, D
+                keys = tuple(options)
+                opt_keys = keys if keys == _CANON[:len(keys)] else sorted(keys)
+                opt_pairs = [(key, clean_option_text(options[key])) for key in opt_keys]
+
+                # Store structured data for DOCX (options already ordered and cleaned)
+                chapter_mcqs_data.append({
+                    'number': mcq_counter,
+                    'question': q_text,
+                    'options': opt_pairs,
+                    'answer': ans,
+                    'explanation':  exp
+                })
+
+                opts_block = "".join([OPT_TEMPLATE.format(k=key, v=text) for key, text in opt_pairs])
+                block = Q_TEMPLATE.format(n=mcq_counter, q=q_text, opts=opts_block)
+                emit(chapter_content, chapter_answers, book_answer_blocks,
+                     mcq_counter, disease, q_text, block, ans, exp)
+
+                mcq_counter += 1
+
+            # one warning per chapter rather than one print per bad MCQ
+            if skipped:
+                print(f"  WARNING:  Skipping {skipped} malformed MCQ(s) in {file_path}")
+
+            if ANSWER_PLACEMENT == "chapter_end" and chapter_answers:
+                chapter_content.append("\n**Answer Key (this chapter)**\n")
+                for num, ans, exp in chapter_answers:
+                    chapter_content.append(f"- **MCQ {num}** — **{ans}**:  {exp}")
                 chapter_content.append("\n---\n")
-            else:
-                chapter_content.append("\n")
-                chapter_answers.append((mcq_counter, ans, exp))
-                book_answer_blocks.append((mcq_counter, disease, q_text, ans, exp))
 
-            mcq_counter += 1
-
-        if ANSWER_PLACEMENT == "chapter_end" and chapter_answers:
-            chapter_content.append("\n**Answer Key (this chapter)**\n")
-            for num, ans, exp in chapter_answers:
-                chapter_content.append(f"- **MCQ {num}** — **{ans}**:  {exp}")
-            chapter_content.append("\n---\n")
-
-        all_chapters.append("".join(chapter_content))
-        all_chapters_data.append({
-            'disease': disease,
-            'mcqs': chapter_mcqs_data
-        })
-
-    md_lines = []
-    md_lines. append(YAML_HEADER)
-
-    toc_lines = ["## Table of Contents\n"]
-    for disease, slug in toc_entries:
-        toc_lines.append(f"- [{disease}](#{slug})")
-
-    md_lines.append("\n".join(toc_lines))
-    md_lines.append("\n---\n")
+            body.write("\n")
+            body.writelines(chapter_content)
+            all_chapters_data.append({
+                'disease': disease,
+                'mcqs': chapter_mcqs_data
+            })
 
-    md_lines.extend(all_chapters)
+        # Pass 2: header and TOC first, then the chapter bodies, then the footer
+        body.seek(0)
+        with open(MD_OUTPUT_FILE, "w", encoding="utf-8", buffering=WRITE_BUFFER) as out:
+            toc = "".join([f"\n- [{disease}](#{slug})" for disease, slug in toc_entries])
+            out.write(f"{YAML_HEADER}\n## Table of Contents\n{toc}\n\n---\n")
 
-    if ANSWER_PLACEMENT == "book_end" and book_answer_blocks: 
-        md_lines.append("\n# Complete Answer Key\n")
-        for num, disease, qtext, ans, exp in book_answer_blocks:
-            md_lines.append(f"- **MCQ {num}** ({disease}) — **{ans}**: {exp}")
+            shutil.copyfileobj(body, out)
 
-    with open(MD_OUTPUT_FILE, "w", encoding="utf-8") as out:
-        out.write("\n".join(md_lines))
+            if ANSWER_PLACEMENT == "book_end" and book_answer_blocks: 
+                out.write("\n\n# Complete Answer Key\n")
+                for num, disease, qtext, ans, exp in book_answer_blocks:
+                    out.write(f"\n- **MCQ {num}** ({disease}) — **{ans}**: {exp}")
 
     print(f"\n{'='*80}")
     print(f"✓ Markdown output:  {MD_OUTPUT_FILE}")
@@ -417,7 +517,7 @@ def build_docx_book(toc_entries, all_chapters_data, book_answer_blocks, mcq_coun
     year_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
     year_run = year_para.add_run(YEAR)
     year_run.font.name = 'Times New Roman'
-    year_run.font.size = Pt(12)
+    year_run.font.size = _PT12
     
     doc.add_page_break()
 
@@ -425,6 +525,7 @@ def build_docx_book(toc_entries, all_chapters_data, book_answer_blocks, mcq_coun
     add_toc(doc, toc_entries)
 
     # Process all chapters with structured data
+    immediate = ANSWER_PLACEMENT == "immediate"
     chapter_counter = 0
     for chapter_data in all_chapters_data:
         disease = chapter_data['disease']
@@ -448,12 +549,11 @@ def build_docx_book(toc_entries, all_chapters_data, book_answer_blocks, mcq_coun
             add_question(doc, mcq_num, q_text)
             
             # Add options
-            for key in sorted(options.keys()):
-                option_text = clean_option_text(options[key])
+            for key, option_text in options:
                 add_option(doc, key, option_text)
             
             # Add answer and explanation
-            if ANSWER_PLACEMENT == "immediate": 
+            if immediate:
                 add_answer(doc, ans)
                 if exp: 
                     add_explanation(doc, exp)
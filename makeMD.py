@@ -6,12 +6,19 @@ build_ordered_mcq_book_fixed.py
 - Auto-numbers MCQs across chapters
 """
 
-import json
+import codecs
 import os
-import glob
 import re
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+import ijson
+import orjson
+
 # --------------------------
 # CONFIG
 # --------------------------
@@ -28,6 +35,18 @@ SHOW_CHAPTER_SOURCE = False
 # Answer placement: "immediate", "chapter_end", "book_end"
 ANSWER_PLACEMENT = "immediate"
 
+# number of threads used to read chapter JSON files ahead of the builder
+LOAD_WORKERS = 16
+
+# max chapter files read (or being read) ahead of the one being written
+LOAD_AHEAD = LOAD_WORKERS * 2
+
+# chapter files above this size (bytes) are streamed MCQ by MCQ instead of loaded whole
+STREAM_THRESHOLD = 1 << 20
+
+# write buffer for the output book (bytes)
+WRITE_BUFFER = 1 << 20
+
 # --------------------------
 # YAML metadata header
 # --------------------------
@@ -42,6 +61,17 @@ description: "A comprehensive collection of pediatric surgery MCQs organized by
 ---
 """
 
+# --------------------------
+# MCQ templates (one rendered block per question)
+# --------------------------
+OPT_TEMPLATE = "- **{k}.** {v}"
+Q_TEMPLATE = "### MCQ {n}: {q}\n{opts}"
+ANSWER_TEMPLATE = "\n**Answer:** **{a}**  {e}\n---\n"
+EXPLANATION_TEMPLATE = "**Explanation:** {e}\n"
+
+# option keys as they almost always appear; lets build_book skip sorting
+_CANON = ("A", "B", "C", "D", "E")
+
 # --------------------------
 # Helpers
 # --------------------------
@@ -52,22 +82,36 @@ def read_order_file(order_file):
         lines = [line.strip() for line in f if line.strip()]
     return lines
 
-def find_file_in_input(candidate_name):
+def build_input_index():
+    """Map lowercase .json basenames in INPUT_FOLDER to their real paths.
+
+    Like the glob scan it replaces, the first entry listed wins when two
+    names differ only in case.
+    """
+    index = {}
+    with os.scandir(INPUT_FOLDER) as it:
+        for e in it:
+            lower = e.name.lower()
+            if lower.endswith(".json"):
+                index.setdefault(lower, e.path)
+    return index
+
+def find_file_in_input(candidate_name, index):
     """
     Given candidate from order.txt (with or without .json),
     return the real path in INPUT_FOLDER (case-insensitive match).
+    `index` is the lookup table from build_input_index().
     """
     candidate = candidate_name if candidate_name.lower().endswith(".json") else candidate_name + ".json"
     path = os.path.join(INPUT_FOLDER, candidate)
     if os.path.exists(path):
         return path
     # try case-insensitive exact basename match
-    basename_lower = os.path.basename(candidate).lower()
-    for p in glob.glob(os.path.join(INPUT_FOLDER, "*.json")):
-        if os.path.basename(p).lower() == basename_lower:
-            return p
-    return None
+    return index.get(os.path.basename(candidate).lower())
+
+_NUM_PREFIX = re.compile(r"^\d+_+")
 
+@lru_cache(maxsize=None)
 def clean_source_display(filename):
     """Remove leading numeric prefix like '74_' and trailing .json"""
     name = os.path.basename(filename)
@@ -75,32 +119,99 @@ def clean_source_display(filename):
     if name.lower().endswith(".json"):
         name = name[:-5]
     # remove leading numbers and underscore(s)
-    name = re.sub(r"^\d+_+", "", name)
+    name = _NUM_PREFIX.sub("", name)
     # Replace underscores with spaces and capitalize
     name = name.replace('_', ' ').replace(' mcqs', '').title()
     return name
 
+_SLUG_STRIP = re.compile(r'[^\w\s-]')
+
+@lru_cache(maxsize=None)
 def slugify(text):
     """Convert text to a URL-friendly slug."""
-    return re.sub(r'[^\w\s-]', '', text).strip().lower().replace(' ', '-')
+    return _SLUG_STRIP.sub('', text).strip().lower().replace(' ', '-')
 
 def load_json_file(file_path):
     """Load JSON file and return data."""
+    raw = Path(file_path).read_bytes()
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except UnicodeDecodeError:
-        with open(file_path, 'r', encoding='utf-8-sig') as f: # Handle BOM
-            return json.load(f)
-    except json.JSONDecodeError as e:
+        return orjson.loads(raw.removeprefix(codecs.BOM_UTF8)) # Handle BOM
+    except orjson.JSONDecodeError:
         print(f"  WARNING: Skipping malformed JSON in {file_path}")
         return None
 
+# marker returned by load_chapter for files that iter_mcqs will stream later
+STREAMED = object()
+
+def load_chapter(file_path):
+    """Load a chapter file, deferring files above STREAM_THRESHOLD to iter_mcqs."""
+    if os.path.getsize(file_path) > STREAM_THRESHOLD:
+        return STREAMED
+    return load_json_file(file_path)
+
+def iter_mcqs(file_path):
+    """Yield the MCQs of a large chapter file one at a time."""
+    with open(file_path, 'rb') as f:
+        if f.read(3) != codecs.BOM_UTF8: # Handle BOM
+            f.seek(0)
+        try:
+            yield from ijson.items(f, 'mcqs.item')
+        except ijson.JSONError:
+            print(f"  WARNING: Stopped at malformed JSON in {file_path}")
+
+def load_chapter_entry(file_path):
+    """Load worker: (display_src, disease, slug, data) for one chapter file.
+
+    The chapter names depend only on the filename, so the threads that read the
+    files derive them too and the build loop does no regex work of its own.
+    """
+    # Always derive the disease name from the filename for consistent ordering.
+    # (the optional source line shows it unstripped)
+    display_src = clean_source_display(file_path)
+    disease = display_src.strip()
+    return display_src, disease, slugify(disease), load_chapter(file_path)
+
+def load_chapters(file_paths):
+    """Yield load_chapter_entry() for each path, in order.
+
+    At most LOAD_AHEAD files are read ahead of the builder, so parsed chapters
+    never pile up in memory faster than they are written out.
+    """
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as ex:
+        window = deque()
+        for file_path in file_paths:
+            window.append(ex.submit(load_chapter_entry, file_path))
+            if len(window) >= LOAD_AHEAD:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
 
 # --------------------------
 # Build function
 # --------------------------
 
+def _emit_immediate(chapter_content, answers, num, disease, q_text, block, ans, exp):
+    """Write the answer and explanation right under the question."""
+    exp_block = EXPLANATION_TEMPLATE.format(e=exp) if exp else ""
+    chapter_content.append(block + ANSWER_TEMPLATE.format(a=ans, e=exp_block))
+
+def _emit_chapter_end(chapter_content, answers, num, disease, q_text, block, ans, exp):
+    """Write the question; keep its answer for the chapter's answer key."""
+    chapter_content.append(block + "\n")
+    answers.append((num, ans, exp))
+
+def _emit_book_end(chapter_content, answers, num, disease, q_text, block, ans, exp):
+    """Write the question; keep its answer for the book's answer key."""
+    chapter_content.append(block + "\n")
+    answers.append((num, disease, q_text, ans, exp))
+
+_EMITTERS = {
+    "immediate": _emit_immediate,
+    "chapter_end": _emit_chapter_end,
+    "book_end": _emit_book_end,
+}
+
 def build_book():
     """Builds the MCQ book from JSON files based on the order specified in ORDER_FILE."""
     os.makedirs(INPUT_FOLDER, exist_ok=True)
@@ -111,97 +222,89 @@ def build_book():
     ordered_filenames = read_order_file(ORDER_FILE)
     print("Processing files in this order:", ordered_filenames)
 
-    all_chapters = []
     toc_entries = []
     mcq_counter = 1
     book_answer_blocks = []
 
+    # Pick the per-question emitter once instead of branching on every MCQ
+    chapter_end = ANSWER_PLACEMENT == "chapter_end"
+    emit = _EMITTERS.get(ANSWER_PLACEMENT, _emit_book_end)
+
+    index = build_input_index()
+    resolved = []
     for listed in ordered_filenames:
-        file_path = find_file_in_input(listed)
+        file_path = find_file_in_input(listed, index)
         if not file_path:
             print(f"WARNING: Listed file not found in {INPUT_FOLDER}: {listed}  (skipping)")
             continue
+        resolved.append((listed, file_path))
 
-        data = load_json_file(file_path)
-        if data is None:
-            continue
+    # Chapter files are read concurrently, a bounded window ahead, in order.txt sequence
+    chapters = load_chapters([file_path for _, file_path in resolved])
 
-        # --- MODIFICATION ---
-        # Always derive the disease name from the filename for consistent ordering.
-        disease = clean_source_display(file_path)
-        # --- END MODIFICATION ---
-        
-        disease = disease.strip()
-        chapter_slug = slugify(disease)
+    # Pass 1: chapter bodies go to a scratch file so the book never sits in memory
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as body:
+        for (listed, file_path), (display_src, disease, chapter_slug, data) in zip(resolved, chapters):
+            if data is None:
+                continue
 
-        print(f"Processing: {listed} -> {disease}")
+            print(f"Processing: {listed} -> {disease}")
 
-        chapter_content = []
-        chapter_answers = []
+            chapter_content = []
+            answers = [] if chapter_end else book_answer_blocks
 
-        chapter_content.append(f"\n\n# {disease}\n")
-        if SHOW_CHAPTER_SOURCE:
-            display_src = clean_source_display(os.path.basename(file_path))
-            chapter_content.append(f"*Chapter source file: `{display_src}`*\n")
+            chapter_content.append(f"\n\n# {disease}\n")
+            if SHOW_CHAPTER_SOURCE:
+                chapter_content.append(f"*Chapter source file: `{display_src}`*\n")
 
-        toc_entries.append((disease, chapter_slug))
+            toc_entries.append((disease, chapter_slug))
 
-        mcqs = data.get("mcqs", [])
+            mcqs = iter_mcqs(file_path) if data is STREAMED else data.get("mcqs", [])
 
-        for q in mcqs:
-            q_text = q.get("question", "").strip()
-            if not q_text:
-                print(f"  WARNING: Skipping malformed MCQ in {file_path}")
-                continue
+            skipped = 0
+            for q in mcqs:
+                q_text = q.get("question", "").strip()
+                if not q_text:
+                    skipped += 1
+                    continue
             
-            options = q.get("options", {})
-            ans = str(q.get("correct_answer", "")).strip()
-            exp = q.get("explanation", "").strip()
-
-            chapter_content.append(f"### MCQ {mcq_counter}: {q_text}\n")
-            # Ensure options are sorted, typically A, B, C, D
-            for key in sorted(options.keys()):
-                chapter_content.append(f"- **{key}.** {options[key]}")
-
-            if ANSWER_PLACEMENT == "immediate":
-                chapter_content.append(f"\n**Answer:** **{ans}**  ")
-                if exp:
-                    chapter_content.append(f"**Explanation:** {exp}\n")
+                options = q.get("options", {})
+                ans = str(q.get("correct_answer", "")).strip()
+                exp = q.get("explanation", "").strip()
+
+                # Ensure options are sorted, typically A, B, C, D
+                keys = tuple(options)
+                opt_keys = keys if keys == _CANON[:len(keys)] else sorted(keys)
+                opts_block = "".join([OPT_TEMPLATE.format(k=key, v=options[key]) for key in opt_keys])
+                block = Q_TEMPLATE.format(n=mcq_counter, q=q_text, opts=opts_block)
+                emit(chapter_content, answers, mcq_counter, disease, q_text, block, ans, exp)
+                mcq_counter += 1
+
+            # one warning per chapter rather than one print per bad MCQ
+            if skipped:
+                print(f"  WARNING: Skipping {skipped} malformed MCQ(s) in {file_path}")
+
+            if chapter_end and answers:
+                chapter_content.append("\n**Answer Key (this chapter)**\n")
+                for num, ans, exp in answers:
+                    chapter_content.append(f"- **MCQ {num}** — **{ans}**: {exp}")
                 chapter_content.append("\n---\n")
-            else:
-                chapter_content.append("\n")
-                chapter_answers.append((mcq_counter, ans, exp))
-                book_answer_blocks.append((mcq_counter, disease, q_text, ans, exp))
-            
-            mcq_counter += 1
-
-        if ANSWER_PLACEMENT == "chapter_end" and chapter_answers:
-            chapter_content.append("\n**Answer Key (this chapter)**\n")
-            for num, ans, exp in chapter_answers:
-                chapter_content.append(f"- **MCQ {num}** — **{ans}**: {exp}")
-            chapter_content.append("\n---\n")
-
-        all_chapters.append("".join(chapter_content))
-
-    md_lines = []
-    md_lines.append(YAML_HEADER)
 
-    toc_lines = ["## Table of Contents\n"]
-    for disease, slug in toc_entries:
-        toc_lines.append(f"- [{disease}](#{slug})")
-    
-    md_lines.append("\n".join(toc_lines))
-    md_lines.append("\n---\n")
+            body.write("\n")
+            body.writelines(chapter_content)
 
-    md_lines.extend(all_chapters)
+        # Pass 2: header and TOC first, then the chapter bodies, then the footer
+        body.seek(0)
+        with open(OUTPUT_FILE, "w", encoding="utf-8", buffering=WRITE_BUFFER) as out:
+            toc = "".join([f"\n- [{disease}](#{slug})" for disease, slug in toc_entries])
+            out.write(f"{YAML_HEADER}\n## Table of Contents\n{toc}\n\n---\n")
 
-    if ANSWER_PLACEMENT == "book_end" and book_answer_blocks:
-        md_lines.append("\n# Complete Answer Key\n")
-        for num, disease, qtext, ans, exp in book_answer_blocks:
-            md_lines.append(f"- **MCQ {num}** ({disease}) — **{ans}**: {exp}")
+            shutil.copyfileobj(body, out)
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-        out.write("\n".join(md_lines))
+            if ANSWER_PLACEMENT == "book_end" and book_answer_blocks:
+                out.write("\n\n# Complete Answer Key\n")
+                for num, disease, qtext, ans, exp in book_answer_blocks:
+                    out.write(f"\n- **MCQ {num}** ({disease}) — **{ans}**: {exp}")
 
     print(f"Finished. Output written to: {OUTPUT_FILE}")
     print(f"Total MCQs: {mcq_counter - 1}")
@@ -1,19 +1,74 @@
+import codecs
 import json
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 import re
 
+import orjson
+
+# threads used to read the JSON files and to copy the renamed ones
+WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+_FNAME_BAD = re.compile(r'[<>:"/\\|?*\s]+')
+_UNDERS = re.compile(r'_+')
+
+@lru_cache(maxsize=None)
 def clean_filename(text):
     """Clean disease name to make it safe for filenames."""
     # Replace spaces and special characters with underscores
     # Remove or replace characters that are invalid in filenames
-    cleaned = re.sub(r'[<>:"/\\|?*\s]+', '_', text)
+    cleaned = _FNAME_BAD.sub('_', text)
     # Remove multiple consecutive underscores
-    cleaned = re.sub(r'_+', '_', cleaned)
+    cleaned = _UNDERS.sub('_', cleaned)
     # Remove leading/trailing underscores
     cleaned = cleaned.strip('_')
     return cleaned.lower() + '.json'
 
+def copy_file(src, dst):
+    """Like shutil.copy2, but the kernel copies the bytes (a reflink on CoW filesystems)."""
+    if not hasattr(os, 'copy_file_range'):  # Linux only
+        shutil.copy2(src, dst)
+        return
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except OSError:
+        # e.g. cross-device on older kernels; start over with a plain copy
+        shutil.copy2(src, dst)
+        return
+    shutil.copystat(src, dst)
+
+def read_disease_filename(json_file):
+    """
+    Read one JSON file and work out the filename its disease tag calls for.
+    
+    Returns (json_file, correct_filename, message); when message is set the
+    file could not be used and message says why.
+    """
+    try:
+        # Read and parse JSON
+        data = orjson.loads(json_file.read_bytes().removeprefix(codecs.BOM_UTF8))
+        
+        # Extract disease tag
+        disease = data.get('disease')
+        if not disease:
+            return json_file, None, f"⚠️  Skipping {json_file.name}: No 'disease' tag found"
+        
+        # Generate correct filename
+        return json_file, clean_filename(disease), None
+    except json.JSONDecodeError:  # orjson's error subclasses it
+        return json_file, None, f"❌ Error parsing {json_file.name}: Invalid JSON"
+    except Exception as e:
+        return json_file, None, f"❌ Error processing {json_file.name}: {str(e)}"
+
 def process_json_files(source_folder, target_subfolder='renamed_files'):
     """
     Check JSON files and rename them based on disease tag.
@@ -31,52 +86,55 @@ def process_json_files(source_folder, target_subfolder='renamed_files'):
     # Counter for statistics
     stats = {'total': 0, 'correct': 0, 'renamed': 0, 'errors': 0}
     
-    # Iterate through all JSON files
-    for json_file in source_path.glob('*.json'):
+    # Read and parse all JSON files in parallel; map() keeps the glob order
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        checked = list(ex.map(read_disease_filename, source_path.glob('*.json')))
+    
+    # Destinations are picked serially so duplicate numbering stays deterministic;
+    # names already in the target folder are listed once instead of stat'ed per probe.
+    # Compared via normcase, so on Windows "Foo.json" still blocks "foo.json" as exists() did
+    copies = []
+    existing = {os.path.normcase(entry.name) for entry in os.scandir(target_path)}
+    for json_file, correct_filename, message in checked:
         stats['total'] += 1
-        try:
-            # Read and parse JSON
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Extract disease tag
-            disease = data.get('disease')
-            if not disease:
-                print(f"⚠️  Skipping {json_file.name}: No 'disease' tag found")
-                stats['errors'] += 1
-                continue
-            
-            # Generate correct filename
-            correct_filename = clean_filename(disease)
-            current_filename = json_file.name
-            
-            # Compare filenames
-            if current_filename.lower() == correct_filename:
-                print(f"✅ {current_filename} - correct")
-                stats['correct'] += 1
-            else:
-                # Create destination path
-                destination = target_path / correct_filename
-                
-                # Handle duplicate filenames
-                counter = 1
-                original_dest = destination
-                while destination.exists():
-                    stem = original_dest.stem
-                    destination = target_path / f"{stem}_{counter}.json"
-                    counter += 1
-                
-                # Copy file to new location with correct name
-                shutil.copy2(json_file, destination)
-                print(f"🔄 {current_filename} -> {destination.name}")
-                stats['renamed'] += 1
-                
-        except json.JSONDecodeError:
-            print(f"❌ Error parsing {json_file.name}: Invalid JSON")
+        if message:
+            print(message)
             stats['errors'] += 1
+            continue
+        
+        current_filename = json_file.name
+        
+        # Compare filenames
+        if current_filename.lower() == correct_filename:
+            print(f"✅ {current_filename} - correct")
+            stats['correct'] += 1
+        else:
+            # Handle duplicate filenames (including ones claimed earlier in this run)
+            dest_name = correct_filename
+            stem = dest_name[:-5]
+            counter = 1
+            while os.path.normcase(dest_name) in existing:
+                dest_name = f"{stem}_{counter}.json"
+                counter += 1
+            existing.add(os.path.normcase(dest_name))
+            copies.append((json_file, target_path / dest_name))
+    
+    # Copy files to their new locations with correct names, in parallel
+    def copy_one(pair):
+        try:
+            copy_file(*pair)
         except Exception as e:
-            print(f"❌ Error processing {json_file.name}: {str(e)}")
-            stats['errors'] += 1
+            return e
+        return None
+    
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        for (json_file, destination), error in zip(copies, ex.map(copy_one, copies)):
+            if error is None:
+                print(f"🔄 {json_file.name} -> {destination.name}")
+                stats['renamed'] += 1
+            else:
+                print(f"❌ Error processing {json_file.name}: {str(error)}")
+                stats['errors'] += 1
     
     # Print summary
     print("\n" + "="*50)
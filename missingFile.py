@@ -1,10 +1,12 @@
+import sys
+
 def find_missing_filename(file1_path, file2_path):
-    # Read the contents of both files
+    # Read both files line by line straight into sets (blank lines ignored)
     with open(file1_path, 'r') as file1:
-        filenames1 = set(file1.read().splitlines())
+        filenames1 = {line.rstrip() for line in file1 if line.strip()}
 
     with open(file2_path, 'r') as file2:
-        filenames2 = set(file2.read().splitlines())
+        filenames2 = {line.rstrip() for line in file2 if line.strip()}
 
     # Find missing filenames in each direction
     missing_in_file1 = filenames2 - filenames1
@@ -12,16 +14,19 @@ def find_missing_filename(file1_path, file2_path):
 
     return missing_in_file1, missing_in_file2
 
+def format_names(filenames):
+    # One sorted block per list so the output is stable and written in a single call
+    return "".join(f"{filename}\n" for filename in sorted(filenames))
+
 # Example usage (replace with your actual file paths)
 file1_path = 'file1.txt'
 file2_path = 'file2.txt'
 
 missing_in_file1, missing_in_file2 = find_missing_filename(file1_path, file2_path)
 
-print(f"Filenames in {file2_path} but missing in {file1_path}:")
-for filename in missing_in_file1:
-    print(filename)
-
-print(f"\nFilenames in {file1_path} but missing in {file2_path}:")
-for filename in missing_in_file2:
-    print(filename)
+sys.stdout.write(
+    f"Filenames in {file2_path} but missing in {file1_path}:\n"
+    + format_names(missing_in_file1)
+    + f"\nFilenames in {file1_path} but missing in {file2_path}:\n"
+    + format_names(missing_in_file2)
+)
@@ -1,123 +1,280 @@
 # order_generator.py
 import os
+import re
 from datetime import datetime
-from pathlib import Path
+
+_LEADING_DIGITS = re.compile(r'\d+')
+
+def _natural_key(name):
+    """Sort key putting '2_x.json' before '10_x.json'; names without a number go last."""
+    m = _LEADING_DIGITS.match(name)
+    return (int(m.group()) if m else float('inf'), os.path.normcase(name))
+
+def _list_json_files(folder_path):
+    """
+    Names of the .json files directly inside folder_path, minus our own
+    order/ordered_ outputs, in natural order of their numeric prefixes.
+    """
+    try:
+        with os.scandir(folder_path) as it:
+            names = [
+                entry.name for entry in it
+                if os.path.normcase(entry.name).endswith('.json')  # as glob matches
+                and entry.name not in ["order.txt"] and not entry.name.startswith("ordered_")
+                and entry.is_file()
+            ]
+    except OSError:
+        return []
+    names.sort(key=_natural_key)
+    return names
 
 def find_all_json_files(folder_path):
     """
     Find all JSON files in the folder and mcq_json subfolder.
     Returns list of (relative_path, display_name) tuples with ORIGINAL names.
     """
-    folder = Path(folder_path)
-    files = []
-    
     # Search in mcq_json subfolder (most common)
-    mcq_folder = folder / "mcq_json"
-    if mcq_folder.exists():
-        for f in sorted(mcq_folder.glob("*.json")):
-            if f.name not in ["order.txt"] and not f.name.startswith("ordered_"):
-                relative_path = f.relative_to(folder)
-                files.append((str(relative_path), f.name))
+    files = [(os.path.join("mcq_json", name), name)
+             for name in _list_json_files(os.path.join(folder_path, "mcq_json"))]
     
     # If no files in mcq_json, try main folder
     if not files:
-        for f in sorted(folder.glob("*.json")):
-            if f.name not in ["order.txt"] and not f.name.startswith("ordered_"):
-                files.append((f.name, f.name))
+        files = [(name, name) for name in _list_json_files(folder_path)]
     
     return files
 
-def parse_order_file(order_file_path):
+def _walk_json_index(folder_path):
+    """(index, stamps): lowercase basename -> path of every .json under
+    folder_path, and (folder, mtime) for every folder walked.
+
+    Walks the tree once with os.scandir in the same order rglob("*.json")
+    visits it (a folder's own files, then each subfolder in turn), so the
+    first match still wins. Hidden folders such as .git are skipped.
+    """
+    index = {}
+    stamps = []
+    pending = [folder_path]
+    while pending:
+        current = pending.pop()
+        subdirs = []
+        try:
+            # stat'ed before listing: a change in between only makes the stamp stale
+            stamps.append((current, os.stat(current).st_mtime_ns))
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith('.'):
+                            subdirs.append(entry.path)
+                    elif os.path.normcase(entry.name).endswith('.json'):  # as rglob matches
+                        index.setdefault(entry.name.lower(), entry.path)
+        except OSError:
+            continue
+        # depth-first, first subfolder listed is walked first
+        pending.extend(reversed(subdirs))
+    return index, tuple(stamps)
+
+def _stamps_current(stamps):
+    """True while none of the walked folders has gained, lost or renamed an entry."""
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in stamps)
+    except OSError:
+        return False
+
+def _folder_stamp(folder_path):
+    """mtimes of folder_path and its mcq_json subfolder; changes when files come or go."""
+    stamp = []
+    for path in (folder_path, os.path.join(folder_path, "mcq_json")):
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+# _walk_json_index results by folder: (index, stamps), oldest first
+_index_cache = {}
+INDEX_CACHE_SIZE = 8
+
+def _index_json_files(folder_path):
+    """
+    Index of the .json files under folder_path, reused while none of the
+    folders it walked has changed (e.g. reloading in the GUI).
+    """
+    cached = _index_cache.pop(folder_path, None)
+    if cached is None or not _stamps_current(cached[1]):
+        cached = _walk_json_index(folder_path)
+    _index_cache[folder_path] = cached  # (re)inserted as most recent
+    while len(_index_cache) > INDEX_CACHE_SIZE:
+        del _index_cache[next(iter(_index_cache))]
+    return cached[0]
+
+def _list_names(folder_path):
+    """Names of the files directly inside folder_path (empty if it can't be listed)."""
+    try:
+        with os.scandir(folder_path) as it:
+            return {entry.name for entry in it if entry.is_file()}
+    except OSError:
+        return set()
+
+def parse_order_file(order_file_path, files_index=None):
     """
     Parse an existing order.txt file.
     Each line is treated as an EXACT filename to find (e.g., "01_abdominal_trauma_mcqs.json").
+    `files_index` (line -> path, as returned by generate_initial_order_file)
+    resolves the lines it knows without touching the folder again.
     """
-    folder_path = str(Path(order_file_path).parent)
+    folder_path = os.path.dirname(order_file_path) or "."
     ordered_files = []
     filename_mapping = {}
     
-    with open(order_file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    index = None  # built on the first line that needs the case-insensitive search
     
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # The line IS the filename - find it exactly as written
-        folder = Path(folder_path)
-        
-        # Try mcq_json subfolder first
-        mcq_path = folder / "mcq_json" / line
-        if mcq_path.exists():
-            ordered_files.append(line)
-            filename_mapping[line] = str(mcq_path)
-            continue
-        
-        # Try main folder
-        main_path = folder / line
-        if main_path.exists():
-            ordered_files.append(line)
-            filename_mapping[line] = str(main_path)
-            continue
-        
-        # Try case-insensitive search as last resort
-        found = False
-        for f in folder.rglob("*.json"):
-            if f.name.lower() == line.lower():
-                relative_path = f.relative_to(folder_path)
+    # Both folders are listed once; plain names are checked against these sets
+    # instead of stat'ing each candidate path. Lines holding a relative path
+    # (e.g. "mcq_json/01_file.json") still go to the filesystem.
+    # With a files_index the listings are skipped; lines it lacks are stat'ed.
+    mcq_folder = os.path.join(folder_path, "mcq_json")
+    if files_index is None:
+        files_index = {}
+        mcq_names = _list_names(mcq_folder)
+        main_names = _list_names(folder_path)
+    else:
+        mcq_names = main_names = None
+    
+    # Stream the order file line by line instead of reading it all with readlines()
+    with open(order_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            
+            # The line IS the filename - find it exactly as written
+            known = files_index.get(line)
+            if known:
+                ordered_files.append(line)
+                filename_mapping[line] = known
+                continue
+            
+            plain = mcq_names is not None and os.path.basename(line) == line
+            
+            # Try mcq_json subfolder first
+            mcq_path = os.path.join(mcq_folder, line)
+            if (line in mcq_names) if plain else os.path.isfile(mcq_path):
                 ordered_files.append(line)
-                filename_mapping[line] = str(f)
-                found = True
-                break
-        
-        if not found:
-            print(f"⚠️  File not found: {line}")
+                filename_mapping[line] = mcq_path
+                continue
+            
+            # Try main folder
+            main_path = os.path.join(folder_path, line)
+            if (line in main_names) if plain else os.path.isfile(main_path):
+                ordered_files.append(line)
+                filename_mapping[line] = main_path
+                continue
+            
+            # Try case-insensitive search as last resort
+            if index is None:
+                index = _index_json_files(folder_path)
+            found = index.get(line.lower())
+            if found:
+                ordered_files.append(line)
+                filename_mapping[line] = found
+            else:
+                print(f"⚠️  File not found: {line}")
     
     if not ordered_files:
         raise FileNotFoundError(f"No files found in {folder_path}. Ensure JSON files exist.")
     
     return folder_path, ordered_files, filename_mapping
 
+# parse_order_file results by order file path, oldest first:
+# (stamp, result, deep paths, stamps of the folder index it could have used)
+_parse_cache = {}
+PARSE_CACHE_SIZE = 8
+
+def parse_order_file_cached(order_file_path, files_index=None):
+    """
+    parse_order_file, reusing the last result while neither the order file nor
+    the folders it is resolved against have changed. Callers get their own
+    copies of the lists, so reordering in the GUI can't touch the cache.
+    Folders deeper than mcq_json aren't covered by the stamp; a cached result
+    is only reused while its deeper files still exist and the folder index
+    (see _index_json_files) is still current.
+    """
+    order_file_path = os.path.abspath(order_file_path)
+    st = os.stat(order_file_path)
+    folder_path = os.path.dirname(order_file_path)
+    # size too: a quick rewrite can land within the filesystem's mtime granularity
+    stamp = (st.st_mtime_ns, st.st_size, _folder_stamp(folder_path))
+    cached = _parse_cache.pop(order_file_path, None)
+    if (cached is None or cached[0] != stamp
+            or not all(os.path.isfile(path) for path in cached[2])
+            or (cached[3] is not None and not _stamps_current(cached[3]))):
+        result = parse_order_file(order_file_path, files_index)
+        stamped = (folder_path, os.path.join(folder_path, "mcq_json"))
+        deep = [path for path in result[2].values()
+                if os.path.dirname(os.path.abspath(path)) not in stamped]
+        index_entry = _index_cache.get(folder_path)
+        cached = (stamp, result, deep, index_entry[1] if index_entry else None)
+    _parse_cache[order_file_path] = cached  # (re)inserted as most recent
+    while len(_parse_cache) > PARSE_CACHE_SIZE:
+        del _parse_cache[next(iter(_parse_cache))]
+    folder_path, ordered_files, filename_mapping = cached[1]
+    return folder_path, list(ordered_files), dict(filename_mapping)
+
+def _forget_parsed(folder_path):
+    """Drop cached parses of order files in folder_path after we write there."""
+    folder_path = os.path.abspath(folder_path)
+    for path in [p for p in list(_parse_cache) if os.path.dirname(p) == folder_path]:
+        _parse_cache.pop(path, None)  # the GUI saves two files at once
+
 def generate_initial_order_file(folder_path):
     """
     Generate initial order.txt from scratch.
     Uses ORIGINAL filenames exactly as they are on disk.
+    Returns (order_file_path, files_index); files_index maps each line
+    written to its file and can be handed to parse_order_file.
     """
     files = find_all_json_files(folder_path)
     if not files:
         raise FileNotFoundError(f"No JSON files found in {folder_path}")
     
     order_file_path = os.path.join(folder_path, 'order.txt')
+    _forget_parsed(folder_path)
     with open(order_file_path, 'w', encoding='utf-8') as f:
-        for relative_path, display_name in files:
-            # Store the relative path (e.g., "mcq_json/01_file.json")
-            f.write(f"{relative_path}\n")
+        # Store the relative path (e.g., "mcq_json/01_file.json"), one write for the whole file
+        f.write("".join([f"{relative_path}\n" for relative_path, display_name in files]))
     
-    return order_file_path
+    files_index = {relative_path: os.path.join(folder_path, relative_path)
+                   for relative_path, display_name in files}
+    return order_file_path, files_index
+
+def order_payload(ordered_filenames):
+    """Contents of an order file: one filename per line."""
+    return "".join([f"{filename}\n" for filename in ordered_filenames])
 
-def save_ordered_files(folder_path, ordered_filenames):
+def save_ordered_files(folder_path, ordered_filenames, payload=None):
     """
     Save ordered filenames with timestamp - preserves EXACT names
+    `payload` is order_payload(ordered_filenames), when the caller already built it.
     """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     new_filename = f"ordered_{timestamp}.txt"
     new_file_path = os.path.join(folder_path, new_filename)
+    _forget_parsed(folder_path)
     
     with open(new_file_path, 'w', encoding='utf-8') as f:
-        for filename in ordered_filenames:
-            f.write(filename + '\n')
+        f.write(order_payload(ordered_filenames) if payload is None else payload)
     
     return new_file_path
 
-def save_order_txt(folder_path, ordered_filenames):
+def save_order_txt(folder_path, ordered_filenames, payload=None):
     """
     Overwrite the main order.txt file - preserves EXACT names
+    `payload` is order_payload(ordered_filenames), when the caller already built it.
     """
     order_file_path = os.path.join(folder_path, 'order.txt')
+    _forget_parsed(folder_path)
     
     with open(order_file_path, 'w', encoding='utf-8') as f:
-        for filename in ordered_filenames:
-            f.write(filename + '\n')
+        f.write(order_payload(ordered_filenames) if payload is None else payload)
     
     return order_file_path
\ No newline at end of file
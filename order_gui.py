@@ -1,14 +1,31 @@
 # order_gui.py
+import queue
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog, messagebox
 from pathlib import Path
 from order_generator import (
     generate_initial_order_file,
-    parse_order_file,
+    order_payload,
+    parse_order_file_cached,
     save_ordered_files,
     save_order_txt
 )
 
+# delay between auto-scroll steps while dragging at the listbox edge (~30 Hz)
+AUTO_SCROLL_MS = 33
+
+# rows moved per Shift+Up / Shift+Down
+MOVE_JUMP = 10
+
+# how often the Tk thread checks for finished background jobs
+BACKGROUND_POLL_MS = 50
+
+def display_name(filename):
+    """Display only the filename (not the full path)."""
+    return Path(filename).name if '/' in filename or '\\' in filename else filename
+
 class OrderApp:
     def __init__(self, root):
         self.root = root
@@ -18,6 +35,14 @@ class OrderApp:
         self.folder_path = ""
         self.ordered_files = []  # These are the EXACT original filenames
         self.drag_index = None
+        self.drag_y = 0
+        self.scroll_direction = 0  # -1/+1 while a drag holds the pointer at an edge
+        self.scroll_job = None
+        self.drag_job = None  # pending after_idle reorder for the latest motion event
+        self.listbox_height = 0  # kept current by <Configure>, read on every drag motion
+        self.selected_index = None  # mirrors the listbox selection; see on_listbox_select
+        self.finished_jobs = queue.Queue()  # (done, result, error) from worker threads
+        self.running_jobs = 0  # background jobs not yet handed to their done()
 
         self.create_widgets()
 
@@ -36,7 +61,10 @@ class OrderApp:
         control_frame = tk.Frame(self.root)
         control_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
 
-        self.file_listbox = tk.Listbox(control_frame, selectmode=tk.SINGLE, height=35, width=120)
+        # Listbox rows live in a Tcl list variable so a reload is a single assignment
+        self.list_var = tk.Variable(value=[])
+        self.file_listbox = tk.Listbox(control_frame, listvariable=self.list_var,
+                                       selectmode=tk.SINGLE, height=35, width=120)
         self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
 
         self.scrollbar = tk.Scrollbar(control_frame, orient=tk.VERTICAL, command=self.file_listbox.yview)
@@ -47,6 +75,10 @@ class OrderApp:
         self.file_listbox.bind('<Button-1>', self.on_listbox_click)
         self.file_listbox.bind('<B1-Motion>', self.on_listbox_drag)
         self.file_listbox.bind('<ButtonRelease-1>', self.on_listbox_release)
+        self.file_listbox.bind('<Configure>', self.on_listbox_configure)
+        self.file_listbox.bind('<<ListboxSelect>>', self.on_listbox_select)
+        self.root.bind('<Shift-Up>', lambda event: self.move_by(-MOVE_JUMP))
+        self.root.bind('<Shift-Down>', lambda event: self.move_by(MOVE_JUMP))
 
         # Reorder buttons frame
         button_frame = tk.Frame(control_frame)
@@ -66,13 +98,15 @@ class OrderApp:
         """Select a folder and generate initial order from JSON files."""
         self.folder_path = filedialog.askdirectory()
         if self.folder_path:
-            try:
-                order_file_path = generate_initial_order_file(self.folder_path)
-                self.folder_path, self.ordered_files, _ = parse_order_file(order_file_path)
-                self.update_listbox()
-                messagebox.showinfo("Success", f"Loaded {len(self.ordered_files)} files with original names preserved")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load files: {e}")
+            folder_path = self.folder_path
+            
+            def scan():
+                # the folder was just listed; let the parser reuse that listing
+                order_file_path, files_index = generate_initial_order_file(folder_path)
+                return parse_order_file_cached(order_file_path, files_index)
+            
+            self.load_in_background(scan, "Loaded {count} files with original names preserved",
+                                    "Failed to load files")
 
     def load_order_file(self):
         """Load an existing order.txt file to resume previous sorting work."""
@@ -82,28 +116,101 @@ class OrderApp:
         )
         
         if order_file_path:
+            self.load_in_background(lambda: parse_order_file_cached(order_file_path),
+                                    "Loaded order file with {count} files",
+                                    "Failed to load order file")
+
+    def run_in_background(self, job, done):
+        """
+        Run job() on a worker thread so disk work doesn't freeze the window,
+        then call done(result, error) back on the Tk thread.
+        The worker never touches Tk: it queues its outcome, and the Tk thread
+        picks it up in poll_background. The load and save buttons stay
+        disabled until then.
+        """
+        self.set_busy(True)
+        
+        def work():
             try:
-                self.folder_path, self.ordered_files, _ = parse_order_file(order_file_path)
-                self.update_listbox()
-                messagebox.showinfo("Success", f"Loaded order file with {len(self.ordered_files)} files")
+                result, error = job(), None
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to load order file: {e}")
+                result, error = None, e
+            self.finished_jobs.put((done, result, error))
+        
+        self.running_jobs += 1
+        if self.running_jobs == 1:
+            self.root.after(BACKGROUND_POLL_MS, self.poll_background)
+        threading.Thread(target=work, daemon=True).start()
+
+    def poll_background(self):
+        """Hand finished jobs to finish_background; keep polling while any still run."""
+        while True:
+            try:
+                done, result, error = self.finished_jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.running_jobs -= 1
+            self.finish_background(done, result, error)
+        if self.running_jobs:
+            self.root.after(BACKGROUND_POLL_MS, self.poll_background)
+
+    def finish_background(self, done, result, error):
+        """Re-enable the buttons and hand a finished job's outcome to done()."""
+        self.set_busy(False)
+        done(result, error)
+
+    def load_in_background(self, job, success_message, error_message):
+        """Run job() (which returns parse_order_file's result) in the background."""
+        self.run_in_background(
+            job, lambda result, error: self.apply_loaded(result, error, success_message, error_message))
+
+    def apply_loaded(self, result, error, success_message, error_message):
+        """Show a finished background load (runs on the Tk thread)."""
+        if error is not None:
+            messagebox.showerror("Error", f"{error_message}: {error}")
+            return
+        self.folder_path, self.ordered_files, _ = result
+        self.update_listbox()
+        messagebox.showinfo("Success", success_message.format(count=len(self.ordered_files)))
+
+    def set_busy(self, busy):
+        """Disable the load and save buttons while a background job runs."""
+        state = tk.DISABLED if busy else tk.NORMAL
+        for button in (self.select_folder_btn, self.load_order_btn, self.generate_order_btn):
+            button.config(state=state)
 
     def update_listbox(self):
         """Updates the listbox while preserving scroll position."""
         current_yview = self.file_listbox.yview()
-        self.file_listbox.delete(0, tk.END)
-        
-        for filename in self.ordered_files:
-            # Display only the filename (not the full path)
-            display_name = Path(filename).name if '/' in filename or '\\' in filename else filename
-            self.file_listbox.insert(tk.END, display_name)
+        self.list_var.set([display_name(filename) for filename in self.ordered_files])
+        self.file_listbox.selection_clear(0, tk.END)
+        self.selected_index = None
             
         if self.drag_index is not None and self.drag_index < len(self.ordered_files):
             self.file_listbox.selection_set(self.drag_index)
+            self.selected_index = self.drag_index
             
         self.file_listbox.yview_moveto(current_yview[0])
 
+    def move_item(self, old_index, new_index):
+        """Move one entry in both the list and the listbox, leaving the rest alone."""
+        item = self.ordered_files.pop(old_index)
+        self.ordered_files.insert(new_index, item)
+        self.file_listbox.delete(old_index)
+        self.file_listbox.insert(new_index, display_name(item))
+        self.file_listbox.selection_clear(0, tk.END)
+        self.file_listbox.selection_set(new_index)
+        self.selected_index = new_index
+
+    def on_listbox_select(self, event):
+        """Keep selected_index in step with selections made by the user."""
+        selection = self.file_listbox.curselection()
+        self.selected_index = selection[0] if selection else None
+
+    def on_listbox_configure(self, event):
+        """Remember the listbox height so drags don't query it per motion event."""
+        self.listbox_height = event.height
+
     def on_listbox_click(self, event):
         """Start drag operation."""
         self.drag_index = self.file_listbox.nearest(event.y)
@@ -113,29 +220,72 @@ class OrderApp:
             
         self.file_listbox.selection_clear(0, tk.END)
         self.file_listbox.selection_set(self.drag_index)
+        self.selected_index = self.drag_index
+        self.drag_y = event.y
 
     def on_listbox_drag(self, event):
         """Move item during drag."""
         if self.drag_index is None:
             return
+        # sideways motion can't change the target row or the scroll edge
+        if event.y == self.drag_y:
+            return
 
-        # Auto-scrolling
-        height = self.file_listbox.winfo_height()
+        # Auto-scrolling runs on a timer while the pointer sits near an edge,
+        # not once per motion event
+        self.drag_y = event.y
+        height = self.listbox_height
         if event.y < 20:
-            self.scroll_up()
+            self.scroll_direction = -1
         elif event.y > height - 20:
-            self.scroll_down()
+            self.scroll_direction = 1
+        else:
+            self.scroll_direction = 0
+        if self.scroll_direction and self.scroll_job is None:
+            self.scroll_job = self.root.after(AUTO_SCROLL_MS, self.auto_scroll_tick)
+
+        # Reorder once per idle turn of the event loop; motion events arriving
+        # before then only move the target (drag_y)
+        if self.drag_job is None:
+            self.drag_job = self.root.after_idle(self.flush_drag)
+
+    def flush_drag(self):
+        """Apply the reorder for the latest pointer position."""
+        self.drag_job = None
+        if self.drag_index is not None:
+            self.drag_to(self.drag_y)
 
-        new_index = self.file_listbox.nearest(event.y)
+    def drag_to(self, y):
+        """Move the dragged item to the row under y."""
+        new_index = self.file_listbox.nearest(y)
         if new_index != self.drag_index and 0 <= new_index < len(self.ordered_files):
-            item = self.ordered_files.pop(self.drag_index)
-            self.ordered_files.insert(new_index, item)
+            self.move_item(self.drag_index, new_index)
             self.drag_index = new_index
-            self.update_listbox()
+
+    def auto_scroll_tick(self):
+        """Scroll one row toward the edge the drag is held at, then re-arm."""
+        if self.drag_index is None or not self.scroll_direction:
+            self.scroll_job = None
+            return
+        if self.scroll_direction < 0:
+            self.scroll_up()
+        else:
+            self.scroll_down()
+        # the dragged item follows the rows scrolling under the pointer
+        self.drag_to(self.drag_y)
+        self.scroll_job = self.root.after(AUTO_SCROLL_MS, self.auto_scroll_tick)
 
     def on_listbox_release(self, event):
         """End drag operation."""
+        if self.drag_job is not None:
+            # land the last motion before the drag ends
+            self.root.after_cancel(self.drag_job)
+            self.flush_drag()
         self.drag_index = None
+        self.scroll_direction = 0
+        if self.scroll_job is not None:
+            self.root.after_cancel(self.scroll_job)
+            self.scroll_job = None
 
     def scroll_up(self):
         self.file_listbox.yview_scroll(-1, "units")
@@ -144,24 +294,20 @@ class OrderApp:
         self.file_listbox.yview_scroll(1, "units")
 
     def move_up(self):
-        selected_index = self.file_listbox.curselection()
-        if not selected_index:
-            return
-        index = selected_index[0]
-        if index > 0:
-            self.ordered_files[index], self.ordered_files[index-1] = self.ordered_files[index-1], self.ordered_files[index]
-            self.update_listbox()
-            self.file_listbox.selection_set(index-1)
+        self.move_by(-1)
 
     def move_down(self):
-        selected_index = self.file_listbox.curselection()
-        if not selected_index:
+        self.move_by(1)
+
+    def move_by(self, delta):
+        """Move the selected file delta rows, stopping at either end, as one move."""
+        index = self.selected_index
+        if index is None:
             return
-        index = selected_index[0]
-        if index < len(self.ordered_files) - 1:
-            self.ordered_files[index], self.ordered_files[index+1] = self.ordered_files[index+1], self.ordered_files[index]
-            self.update_listbox()
-            self.file_listbox.selection_set(index+1)
+        new_index = min(max(index + delta, 0), len(self.ordered_files) - 1)
+        if new_index != index:
+            self.move_item(index, new_index)
+            self.file_listbox.see(new_index)
 
     def generate_order_file(self):
         """Generate final order file."""
@@ -169,19 +315,34 @@ class OrderApp:
             messagebox.showwarning("Warning", "Please select a folder first or load an order file")
             return
 
-        try:
-            # Create timestamped backup
-            new_file_path = save_ordered_files(self.folder_path, self.ordered_files)
-            
-            # Update main order.txt
-            order_txt_path = save_order_txt(self.folder_path, self.ordered_files)
-            
-            messagebox.showinfo("Success", 
-                f"Order files created:\n\n"
-                f"Main: {order_txt_path}\n"
-                f"Backup: {new_file_path}")
-        except Exception as e:
-             messagebox.showerror("Error", f"Failed to save file: {e}")
+        # Both files get the same contents; build them once here (a snapshot of
+        # the current order) and write the two in parallel off the Tk thread
+        folder_path = self.folder_path
+        ordered_files = list(self.ordered_files)
+        payload = order_payload(ordered_files)
+        
+        def save():
+            with ThreadPoolExecutor(max_workers=2) as ex:
+                # Create timestamped backup
+                backup = ex.submit(save_ordered_files, folder_path, ordered_files, payload)
+                
+                # Update main order.txt
+                main = ex.submit(save_order_txt, folder_path, ordered_files, payload)
+                
+                return main.result(), backup.result()
+        
+        self.run_in_background(save, self.show_saved)
+
+    def show_saved(self, result, error):
+        """Report a finished background save (runs on the Tk thread)."""
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to save file: {error}")
+            return
+        order_txt_path, new_file_path = result
+        messagebox.showinfo("Success", 
+            f"Order files created:\n\n"
+            f"Main: {order_txt_path}\n"
+            f"Backup: {new_file_path}")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -6,18 +6,31 @@ Proof-read paediatric-surgery MCQ JSON files with OpenAI API
 """
 
 import asyncio
-import json
+import codecs
+import hashlib
 import os
+import random
+import sqlite3
 import sys
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 import aiohttp
-import openai
-from openai import AsyncOpenAI
+import orjson
 from dotenv import load_dotenv   # <── NEW
 load_dotenv()
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    import uvloop  # optional: faster event loop on Linux/macOS
+except ImportError:
+    uvloop = None
+
 
 # ------------------------------------------------------------------
 # CONFIGURATION – change only these two lines
@@ -27,13 +40,22 @@ MODEL  = "gpt-5.1"          # ← change model name once
 # ------------------------------------------------------------------
 
 REPORT_FILE = "proofread_report.json"
-SEMAPHORE_LIMIT = 10            # concurrency level
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
+STREAM_FILE = "proofread_report.jsonl"   # faulty questions, one line each, as they come in
+CACHE_FILE = ".proofread_cache.sqlite"   # answers by question content; delete to re-check everything
+CACHE_COMMIT_EVERY = 64         # cached answers written per sqlite commit (the rest on close)
+SEMAPHORE_LIMIT = 10            # max requests in flight
+BATCH_SIZE = 8                  # MCQs checked per request; the system prompt is sent once per batch
+API_URL = "https://api.openai.com/v1/chat/completions"
+MAX_RETRIES = 4                 # extra attempts on 408/409/429/5xx or a dropped connection
+# account rate limits; requests are paced to stay under both
+RPM_LIMIT = float(os.getenv("OPENAI_RPM", "500"))
+TPM_LIMIT = float(os.getenv("OPENAI_TPM", "200000"))
+REPLY_TOKENS = 300              # allowance for the (short) JSON reply to each MCQ
+API_KEY = os.getenv("OPENAI_API_KEY")
+if not API_KEY:
     sys.exit("ERROR: set OPENAI_API_KEY environment variable")
 
 print("DEBUG: key starts with", os.getenv("OPENAI_API_KEY", "")[:12])
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 
@@ -41,7 +63,8 @@ client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 # Prompt we send to the model
 # ------------------------------------------------------------------
 SYSTEM_PROMPT = """
-You receive a single JSON object representing a paediatric-surgery MCQ.
+You receive a JSON object {"items": [{"id": <n>, "mcq": {…}}, …]} holding
+paediatric-surgery MCQs. Check every MCQ on its own.
 Perform ONLY a factual / medical accuracy check. Ignore:
 - spelling, punctuation, capitalisation, grammar
 - formatting or stylistic issues
@@ -53,70 +76,299 @@ Report ONLY genuine errors such as:
 - missing or duplicated options
 - contradictory stem and key
 
-Return JSON:
+Return JSON with one entry per item, using the same ids:
 {
-  "errors": ["short factual description", …],   // empty if nothing real found
-  "fixed": { <only the fields you changed> }     // ABSOLUTELY MINIMAL patch
+  "results": [
+    {
+      "id": <n>,
+      "errors": ["short factual description", …],   // empty if nothing real found
+      "fixed": { <only the fields you changed> }     // ABSOLUTELY MINIMAL patch
+    }, …
+  ]
 }
-If no factual mistake exists return {"errors": []} with NO "fixed" key.
+If an MCQ has no factual mistake give {"id": <n>, "errors": []} with NO "fixed" key.
 Do NOT send back the entire question – only the tiny fragment you modified.
 """
 
+# Shape of the reply we ask for. Not "strict", so the server does not enforce
+# it (strict mode needs every object closed, and "fixed" is a free-form patch);
+# ask_openai still checks each item.
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "proofread",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "errors": {"type": "array", "items": {"type": "string"}},
+                            "fixed": {"type": "object"},
+                        },
+                        "required": ["id", "errors"],
+                    },
+                },
+            },
+            "required": ["results"],
+        },
+    },
+}
+
 # ------------------------------------------------------------------
-# Helper: load every .json file in the folder
+# Answers of earlier runs, keyed by question content + model + prompt
 # ------------------------------------------------------------------
-def load_all_mcqs(folder: Path) -> List[Dict[str, Any]]:
-    files = list(folder.glob("*.json"))
-    if not files:
-        print("No JSON files found in folder:", folder.resolve())
-    mcqs = []
-    for fp in files:
+class ResultCache:
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result BLOB)")
+        self.salt = MODEL.encode() + hashlib.sha256(SYSTEM_PROMPT.encode()).digest()
+        # put() runs on the event loop; buffer answers so the loop only blocks
+        # on a commit once every CACHE_COMMIT_EVERY answers
+        self.pending: Dict[str, bytes] = {}
+
+    def key(self, q: Dict[str, Any]) -> str:
+        return hashlib.blake2b(orjson.dumps(mcq_content(q), option=orjson.OPT_SORT_KEYS) + self.salt).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if key in self.pending:
+            return orjson.loads(self.pending[key])
+        row = self.db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self.pending[key] = orjson.dumps(result)
+        if len(self.pending) >= CACHE_COMMIT_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?)", self.pending.items())
+            self.db.commit()
+            self.pending.clear()
+
+    def close(self) -> None:
         try:
-            with fp.open(encoding="utf-8") as fh:
-                data = json.load(fh)
-                # Accept either a single question dict or a list of questions
-                if isinstance(data, list):
-                    for idx, q in enumerate(data):
-                        q["_meta_file"] = fp.name
-                        q["_meta_idx"]  = idx
-                        mcqs.append(q)
-                else:
-                    data["_meta_file"] = fp.name
-                    data["_meta_idx"]  = 0
-                    mcqs.append(data)
-        except Exception as e:
-            print(f"Skipping {fp.name}: {e}")
-    return mcqs
+            self.flush()
+        finally:
+            self.db.close()
+
+def mcq_content(q: Dict[str, Any]) -> Dict[str, Any]:
+    """The question without our _meta_* fields; where it sits doesn't change the answer."""
+    return {k: v for k, v in q.items() if not k.startswith("_meta_")}
 
 # ------------------------------------------------------------------
-# Single async call to OpenAI
+# Helper: load the MCQs of one .json file (runs in a worker thread)
 # ------------------------------------------------------------------
-async def ask_openai(question_json: Dict[str, Any]) -> Dict[str, Any]:
+def load_mcq_file(fp: Path) -> List[Dict[str, Any]]:
+    mcqs = []
     try:
-        response = await client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user",   "content": json.dumps(question_json, ensure_ascii=False)}
-            ],
-            temperature=0
-        )
-        raw = response.choices[0].message.content.strip()
-        return json.loads(raw)
+        data = orjson.loads(fp.read_bytes().removeprefix(codecs.BOM_UTF8)) # Handle BOM
+        # Accept either a single question dict or a list of questions
+        if isinstance(data, list):
+            for idx, q in enumerate(data):
+                q["_meta_file"] = fp.name
+                q["_meta_idx"]  = idx
+                mcqs.append(q)
+        else:
+            data["_meta_file"] = fp.name
+            data["_meta_idx"]  = 0
+            mcqs.append(data)
     except Exception as e:
-        return {"errors": [f"OpenAI call failed: {e}"]}
+        print(f"Skipping {fp.name}: {e}")
+    return mcqs
+
+# ------------------------------------------------------------------
+# Requests-per-minute + tokens-per-minute pacing
+# ------------------------------------------------------------------
+class AsyncRateLimiter:
+    """Two token buckets (requests and tokens) refilled continuously.
+
+    acquire() waits until both buckets hold enough, then takes from them.
+    Waiters are served in arrival order so a large request is not starved.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.requests = requests_per_minute   # both buckets start full
+        self.tokens = tokens_per_minute
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.last
+        self.last = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int = 1) -> None:
+        tokens = min(tokens, self.tpm)  # a request bigger than a minute's budget still goes
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                wait = max((1 - self.requests) * 60 / self.rpm,
+                           (tokens - self.tokens) * 60 / self.tpm)
+                await asyncio.sleep(wait)
+
+_encoding = None
+
+def estimate_tokens(text: str) -> int:
+    """Prompt tokens for text: tiktoken when installed, else ~4 characters a token."""
+    global _encoding
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(MODEL)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text))
+
+# ------------------------------------------------------------------
+# POST, retrying 408/409/429/5xx with exponential backoff
+# ------------------------------------------------------------------
+def backoff(attempt: int) -> float:
+    return min(60, 2 ** attempt + random.random())
+
+def retry_delay(resp: aiohttp.ClientResponse, attempt: int) -> float:
+    try:
+        return min(float(resp.headers["Retry-After"]), 60)
+    except (KeyError, ValueError):
+        return backoff(attempt)
+
+async def post_chat(session: aiohttp.ClientSession, payload: bytes) -> Dict[str, Any]:
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with session.post(API_URL, data=payload) as resp:
+                retryable = resp.status in (408, 409, 429) or resp.status >= 500
+                if not retryable or attempt == MAX_RETRIES:
+                    resp.raise_for_status()
+                    return await resp.json(loads=orjson.loads)
+                delay = retry_delay(resp, attempt)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff(attempt)
+        await asyncio.sleep(delay)
+
+# ------------------------------------------------------------------
+# Single async call to OpenAI for a batch of MCQs
+# ------------------------------------------------------------------
+async def ask_openai(session: aiohttp.ClientSession, questions: List[Dict[str, Any]],
+                     limiter: AsyncRateLimiter) -> Dict[int, Dict[str, Any]]:
+    """Check the questions in one request; returns each answer by its position."""
+    # plain POST to the chat completions endpoint; the reply is read as a dict
+    items = orjson.dumps({"items": [{"id": i, "mcq": mcq_content(q)}
+                                    for i, q in enumerate(questions)]}).decode()
+    payload = orjson.dumps({
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user",   "content": items}
+        ],
+        "temperature": 0,
+        "response_format": RESPONSE_FORMAT,
+    })
+    await limiter.acquire(estimate_tokens(SYSTEM_PROMPT + items) + REPLY_TOKENS * len(questions))
+    response = await post_chat(session, payload)
+    raw = response["choices"][0]["message"]["content"].strip()
+    # items without a usable id are dropped; worker() reports those questions
+    # as failed instead of failing the whole batch
+    answers = {}
+    reply = orjson.loads(raw)
+    results = reply.get("results") if isinstance(reply, dict) else None
+    for res in results if isinstance(results, list) else []:
+        if not isinstance(res, dict):
+            continue
+        try:
+            answers[int(res.pop("id"))] = res
+        except (KeyError, TypeError, ValueError):
+            continue
+    return answers
 
 # ------------------------------------------------------------------
-# Worker with semaphore
+# Worker with semaphore (in-flight cap) and rate limiter (RPM/TPM pacing);
+# checks one batch of (cache key, question) pairs the cache had no answer for
 # ------------------------------------------------------------------
-async def worker(q: Dict[str, Any], sem: asyncio.Semaphore) -> Dict[str, Any]:
+async def worker(session: aiohttp.ClientSession, batch: List[Tuple[str, Dict[str, Any]]],
+                 sem: asyncio.Semaphore, limiter: AsyncRateLimiter,
+                 cache: ResultCache) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    questions = [q for _, q in batch]
     async with sem:
-        result = await ask_openai(q)
-        # keep metadata so we know where this came from
-        result["meta_file"] = q.get("_meta_file")
-        result["meta_idx"]  = q.get("_meta_idx")
-        result["original"]  = q
-        return result
+        try:
+            answers = await ask_openai(session, questions, limiter)
+        except Exception as e:
+            # not cached, retried next run
+            return [(q, {"errors": [f"OpenAI call failed: {e}"]}) for q in questions]
+    answered = []
+    for i, (key, q) in enumerate(batch):
+        result = answers.get(i)
+        if result is None:
+            result = {"errors": ["OpenAI call failed: no result for this question"]}
+        else:
+            cache.put(key, result)
+        answered.append((q, result))
+    return answered
+
+def write_faulty(stream, answered: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> int:
+    """Append the (question, result) pairs with real mistakes to the report stream."""
+    faulty = 0
+    for q, res in answered:
+        if res.get("errors"):                       # only real mistakes
+            stream.write(orjson.dumps({
+                "file": q.get("_meta_file"),
+                "index": q.get("_meta_idx"),
+                "errors": res["errors"],
+                "fixed": res.get("fixed", {})      # tiny patch, not full question
+            }) + b"\n")
+            faulty += 1
+    stream.flush()
+    return faulty
+
+# ------------------------------------------------------------------
+# Read the files off the event loop and check their MCQs; files are read
+# concurrently, so the first API calls start before the last file is parsed.
+# Unchanged questions are answered from the cache. The rest are pooled across
+# files and go out in batches of BATCH_SIZE as soon as a batch is full (a
+# file usually holds a single MCQ object, so per-file batches would be one
+# question each). Faulty questions are appended to `stream` as soon as their
+# answer arrives. Returns (MCQs checked, faulty MCQs).
+# ------------------------------------------------------------------
+async def check_files(session: aiohttp.ClientSession, files: List[Path], sem: asyncio.Semaphore,
+                      limiter: AsyncRateLimiter, cache: ResultCache, stream) -> Tuple[int, int]:
+    async def check_batch(batch: List[Tuple[str, Dict[str, Any]]]) -> int:
+        return write_faulty(stream, await worker(session, batch, sem, limiter, cache))
+
+    total = faulty = 0
+    todo, checks = [], []
+    for loading in asyncio.as_completed([asyncio.to_thread(load_mcq_file, fp) for fp in files]):
+        mcqs = await loading
+        total += len(mcqs)
+        cached = []
+        for q in mcqs:
+            key = cache.key(q)
+            result = cache.get(key)
+            if result is None:
+                todo.append((key, q))
+            else:
+                cached.append((q, result))
+        faulty += write_faulty(stream, cached)
+        while len(todo) >= BATCH_SIZE:
+            checks.append(asyncio.create_task(check_batch(todo[:BATCH_SIZE])))
+            del todo[:BATCH_SIZE]
+    if todo:
+        checks.append(asyncio.create_task(check_batch(todo)))
+    faulty += sum(await asyncio.gather(*checks))
+    return total, faulty
 
 # ------------------------------------------------------------------
 # Main async coordinator
@@ -129,33 +381,50 @@ async def main():
     if not folder_path.is_dir():
         sys.exit(f"Folder '{FOLDER}' does not exist")
 
-    mcqs = load_all_mcqs(folder_path)
-    print(f"Loaded {len(mcqs)} MCQ objects … running factual check …")
-
-    sem   = asyncio.Semaphore(SEMAPHORE_LIMIT)
-    tasks = [asyncio.create_task(worker(q, sem)) for q in mcqs]
-    results = await asyncio.gather(*tasks)
+    files = list(folder_path.glob("*.json"))
+    if not files:
+        print("No JSON files found in folder:", folder_path.resolve())
+    print(f"Found {len(files)} JSON files … running factual check …")
 
-    # build minimal report
-    report = []
-    for res in results:
-        if res.get("errors"):                       # only real mistakes
-            report.append({
-                "file": res["meta_file"],
-                "index": res["meta_idx"],
-                "errors": res["errors"],
-                "fixed": res.get("fixed", {})      # tiny patch, not full question
-            })
+    # One pooled session for every worker: connections (and their TLS
+    # handshakes) are reused, and the pool is sized to the concurrency level
+    connector = aiohttp.TCPConnector(limit=SEMAPHORE_LIMIT * 2,
+                                     limit_per_host=SEMAPHORE_LIMIT * 2,
+                                     ttl_dns_cache=300)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=120, connect=10),
+        headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
+    ) as session:
+        sem   = asyncio.Semaphore(SEMAPHORE_LIMIT)
+        limiter = AsyncRateLimiter(RPM_LIMIT, TPM_LIMIT)
+        cache = ResultCache(CACHE_FILE)
+        try:
+            with open(STREAM_FILE, "wb") as stream:
+                total, faulty = await check_files(session, files, sem, limiter, cache, stream)
+        finally:
+            cache.close()
+    print(f"Checked {total} MCQ objects")
 
-    if report:
-        with open(REPORT_FILE, "w", encoding="utf-8") as fh:
-            json.dump(report, fh, indent=2, ensure_ascii=False)
-        print(f"✅ {len(report)} faulty questions → {REPORT_FILE}")
+    if faulty:
+        # minimal report: the streamed lines as one indented array, in file order
+        order = {fp.name: i for i, fp in enumerate(files)}
+        with open(STREAM_FILE, "rb") as fh:
+            report = [orjson.loads(line) for line in fh]
+        report.sort(key=lambda r: (order[r["file"]], r["index"]))
+        with open(REPORT_FILE, "wb") as fh:
+            fh.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+        print(f"✅ {len(report)} faulty questions → {REPORT_FILE} (live log: {STREAM_FILE})")
     else:
+        os.remove(STREAM_FILE)
         print("✅ No factual errors found – nothing written.")
 
 # ------------------------------------------------------------------
 # Entry-point
 # ------------------------------------------------------------------
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop's event loop when available
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
-import json
+import codecs
+import orjson
 
 # Define the path to your output file
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,8 +11,8 @@ if not os.path.exists(input_file):
     print(f"Error: Could not find {input_file}. Please run your list script first.")
     exit()
 
-with open(input_file, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+with open(input_file, 'rb') as f:
+    data = orjson.loads(f.read().removeprefix(codecs.BOM_UTF8)) # Handle BOM
 
 files = data.get("files", [])
 
@@ -19,37 +20,36 @@ files = data.get("files", [])
 pattern = input("Enter the pattern (e.g., done_): ").strip()
 
 # Step A: Identify all directories that contain a 'done' file
+# (normalized once, so "folder\file" and "folder/file" compare equal on Windows)
 bad_dirs = set()
 for f in files:
     basename = os.path.basename(f)
     dirname = os.path.dirname(f)
     if basename.startswith(pattern):
-        bad_dirs.add(dirname)
+        bad_dirs.add(os.path.normpath(dirname) if dirname else "")
         print(f"Found '{pattern}' in: {dirname}")
 
-# Step B: Filter the list to exclude ANY file inside those directories
-filtered_files = []
-for f in files:
-    # Use normalized path to avoid slash issues
+def in_bad_dir(f):
+    """Is f inside a bad directory or its subfolders? Walks f's parents, so
+    the cost is the path depth rather than the number of bad directories."""
     file_dir = os.path.dirname(f)
-    
-    is_in_bad_dir = False
-    for bd in bad_dirs:
-        # Check if the file is inside a bad directory or its subfolders
-        # Using os.sep ensures we match "folder\file" correctly on Windows
-        if bd == "": # File is in root
-            if file_dir == "":
-                is_in_bad_dir = True
-                break
-        elif f.startswith(bd + os.sep) or f.startswith(bd + "/"):
-            is_in_bad_dir = True
-            break
-        elif f == bd: # The path itself is the directory
-            is_in_bad_dir = True
+    if not file_dir: # File is in root; only root files go with a root 'done'
+        return "" in bad_dirs
+    path = os.path.normpath(f)
+    if path in bad_dirs: # The path itself is the directory
+        return True
+    d = os.path.dirname(path)
+    while d:
+        if d in bad_dirs:
+            return True
+        parent = os.path.dirname(d)
+        if parent == d: # reached "/" (or a drive root)
             break
-            
-    if not is_in_bad_dir:
-        filtered_files.append(f)
+        d = parent
+    return False
+
+# Step B: Filter the list to exclude ANY file inside those directories
+filtered_files = [f for f in files if not in_bad_dir(f)]
 
 # 3. Save the results
 data['files'] = filtered_files
@@ -57,8 +57,8 @@ data['filtered'] = True
 data['filter_pattern'] = pattern
 
 output_file = os.path.join(current_dir, "filtered_file_list_output.json")
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(data, f, indent=4)
+with open(output_file, 'wb') as f:
+    f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 print(f"\nSuccessfully removed {len(files) - len(filtered_files)} file entries.")
 print(f"Remaining files to work on: {len(filtered_files)}")
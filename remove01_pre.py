@@ -1,19 +1,33 @@
+import io
 import re
+from pathlib import Path
+
+try:
+    from charset_normalizer import from_bytes
+except ImportError:
+    from_bytes = None
+
+_NUM_PREFIX = re.compile(r'^\d+_')
 
 def remove_prefixes_from_file(input_file, output_file=None, dry_run=False, encoding='utf-8'):
     """
     Remove numeric prefixes (01_, 02_, etc.) from filenames in a text file.
     Automatically handles encoding issues.
     """
-    def try_read_file(file_path, encodings=['utf-8', 'latin-1', 'cp1252']):
-        """Try reading the file with multiple encodings."""
-        for enc in encodings:
-            try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    return f.readlines(), enc
-            except UnicodeDecodeError:
-                continue
-        raise UnicodeDecodeError(f"Could not decode file with any of: {encodings}")
+    def try_read_file(file_path):
+        """Read the file once; decode it as UTF-8, else as the detected encoding."""
+        raw = Path(file_path).read_bytes()
+        try:
+            text, enc = raw.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            # charset-normalizer (if installed) picks the encoding in one pass;
+            # latin-1 decodes any bytes, as the old retry list ended up doing
+            best = from_bytes(raw).best() if from_bytes else None
+            enc = best.encoding if best else 'latin-1'
+            text = raw.decode(enc)
+        # split like readlines() on a text file: only \n, \r\n and \r end a line
+        # (str.splitlines would also split on \x85, \x0b, \u2028, ...)
+        return io.StringIO(text, newline=None).readlines(), enc
     
     try:
         # Try reading with multiple encodings
@@ -25,7 +39,7 @@ def remove_prefixes_from_file(input_file, output_file=None, dry_run=False, encod
         
         for i, line in enumerate(lines, 1):
             original = line.strip()
-            new_name = re.sub(r'^\d+_', '', original)
+            new_name = _NUM_PREFIX.sub('', original)
             processed_lines.append(new_name + '\n')
             
             if original != new_name:
@@ -45,7 +59,7 @@ def remove_prefixes_from_file(input_file, output_file=None, dry_run=False, encod
         if not dry_run:
             output_path = output_file if output_file else input_file
             with open(output_path, 'w', encoding='utf-8') as f:
-                f.writelines(processed_lines)
+                f.write(''.join(processed_lines))
             print(f"\n✓ Changes saved to: {output_path}")
         else:
             print("\n⚠️  This was a dry run. No changes were saved.")
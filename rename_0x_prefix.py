@@ -2,19 +2,24 @@ import os
 
 def rename_files_with_numbers(folder_path):
     # Get list of files in the directory, sorted alphabetically
-    files = sorted(os.listdir(folder_path))
+    with os.scandir(folder_path) as it:
+        files = sorted(entry.name for entry in it if entry.is_file())
 
-    for index, filename in enumerate(files, start=1):
-        # Create new filename with leading number (2 digits)
-        new_filename = f"{index:02d}_{filename}"
+    # Create new filename with leading number (2 digits)
+    renames = [(os.path.join(folder_path, filename),
+                os.path.join(folder_path, f".tmp_{index:02d}_{filename}"),
+                os.path.join(folder_path, f"{index:02d}_{filename}"))
+               for index, filename in enumerate(files, start=1)]
 
-        # Full paths for old and new filenames
-        old_filepath = os.path.join(folder_path, filename)
-        new_filepath = os.path.join(folder_path, new_filename)
+    # Two passes: first every file moves to a temporary name, then to its new
+    # name, so a new name can never land on a file that hasn't been renamed yet
+    for old_filepath, tmp_filepath, new_filepath in renames:
+        os.replace(old_filepath, tmp_filepath)
+    for old_filepath, tmp_filepath, new_filepath in renames:
+        os.replace(tmp_filepath, new_filepath)
 
-        # Rename the file
-        os.rename(old_filepath, new_filepath)
-        print(f"Renamed: {filename} -> {new_filename}")
+    print("\n".join([f"Renamed: {filename} -> {index:02d}_{filename}"
+                     for index, filename in enumerate(files, start=1)]))
 
 # Example usage:
 folder_path = "your_folder_path_here"  # Replace with your actual folder path
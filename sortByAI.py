@@ -1,24 +1,79 @@
 # ai_sorter.py
 import os
-import json
+import codecs
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import ijson
+import orjson
 from openai import OpenAI
 from dotenv import load_dotenv
 
+# read_json_file results from earlier runs, next to mcq_json; not a .json so
+# the MCQ tools never pick it up as a chapter
+INFO_CACHE = ".files_info.cache"
+
+# files above this size (bytes) are scanned with ijson instead of loaded whole
+STREAM_THRESHOLD = 1 << 20
+
+# number of threads reading JSON files the cache can't answer for
+LOAD_WORKERS = 16
+
+# with --chunk-size the files are split into chunks, each placed into
+# curriculum sections by its own request, CHUNK_WORKERS at a time
+CHUNK_WORKERS = 4
+
+# curriculum sections in book order, as listed in the sorting prompt
+SECTIONS = [
+    "BASIC PRINCIPLES", "HEAD & NECK", "CHEST", "CARDIOVASCULAR", "TRAUMA",
+    "ONCOLOGY", "GASTROINTESTINAL TRACT", "LIVER/BILIARY", "PANCREAS",
+    "ABDOMINAL WALL", "ACUTE ABDOMEN", "GENITOURINARY", "VASCULAR ANOMALIES",
+    "TRANSPLANTATION",
+]
+_SECTION_INDEX = {name: i for i, name in enumerate(SECTIONS)}
+
+_ITEM_END = ("end_map", "end_array", "map_key")
+
+def scan_json_file(file_path):
+    """(disease, questions of the first 3 MCQs, MCQ count) in one streaming pass,
+    without building the MCQ dicts of a large file."""
+    disease_name = ""
+    questions = []
+    question_count = 0
+    with open(file_path, 'rb') as f:
+        if f.read(3) != codecs.BOM_UTF8: # Handle BOM
+            f.seek(0)
+        events = ijson.parse(f, use_float=True)
+        # Same outcome as the in-memory path, which can only .get() from an object
+        if next(events, None) != ("", "start_map", None):
+            raise ValueError("top-level JSON value is not an object")
+        for prefix, event, value in events:
+            if prefix == "mcqs.item":
+                if event not in _ITEM_END:
+                    question_count += 1
+            elif prefix == "mcqs.item.question":
+                if question_count <= 3 and event not in _ITEM_END:
+                    questions.append(value)
+            elif prefix == "disease" and event not in _ITEM_END:
+                disease_name = value
+    return disease_name, questions, question_count
+
 def read_json_file(file_path):
     """Read and extract medical information from a JSON file."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if os.path.getsize(file_path) > STREAM_THRESHOLD:
+            disease_name, questions, question_count = scan_json_file(file_path)
+        else:
+            data = orjson.loads(Path(file_path).read_bytes().removeprefix(codecs.BOM_UTF8)) # Handle BOM
             
-        disease_name = data.get("disease", "")
-        mcqs = data.get("mcqs", [])
+            disease_name = data.get("disease", "")
+            mcqs = data.get("mcqs", [])
+            questions = [mcq.get("question", "") for mcq in mcqs[:3]]
+            question_count = len(mcqs)
         
         # Extract key topics from first few questions for context
         key_topics = []
-        for i, mcq in enumerate(mcqs[:3]):
-            question = mcq.get("question", "")
+        for question in questions:
             if question:
                 key_topics.append(question[:100] + "..." if len(question) > 100 else question)
         
@@ -27,14 +82,64 @@ def read_json_file(file_path):
             "path": str(file_path),
             "disease": disease_name,
             "key_concepts": key_topics,
-            "question_count": len(mcqs)
+            "question_count": question_count
         }
     except Exception as e:
         print(f"❌ Error reading {file_path}: {e}")
         return None
 
-def prepare_medical_sorting_prompt(files_info):
-    """Create a textbook-based prompt for DeepSeek API."""
+def load_info_cache(cache_path):
+    """Cached read_json_file results: path -> {"stamp": [mtime_ns, size], "info": ...}."""
+    try:
+        return orjson.loads(Path(cache_path).read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+
+def save_info_cache(cache_path, cache):
+    """Write the cache back; a failed write only costs a re-read next run."""
+    try:
+        with open(cache_path, 'wb') as f:
+            f.write(orjson.dumps(cache))
+    except OSError as e:
+        print(f"⚠️  Could not save cache {cache_path}: {e}")
+
+def read_json_files(json_files, cache_path=None):
+    """read_json_file for every file, reusing cached results for files whose
+    mtime and size are unchanged. With no cache_path every file is read."""
+    cache = load_info_cache(cache_path) if cache_path else {}
+    stamps = []
+    infos = []
+    misses = []
+    for json_file in json_files:
+        st = json_file.stat()
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = cache.get(str(json_file))
+        stamps.append(stamp)
+        if entry and entry["stamp"] == stamp:
+            infos.append(entry["info"])
+        else:
+            infos.append(None)
+            misses.append(len(infos) - 1)
+
+    # Read the changed files concurrently; map() keeps the file order
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as ex:
+        for i, info in zip(misses, ex.map(read_json_file, [json_files[i] for i in misses])):
+            infos[i] = info
+
+    fresh = {}  # only files still present are written back
+    files_info = []
+    for json_file, stamp, info in zip(json_files, stamps, infos):
+        if info:
+            files_info.append(info)
+            fresh[str(json_file)] = {"stamp": stamp, "info": info}
+    if cache_path:
+        save_info_cache(cache_path, fresh)
+    return files_info
+
+def prepare_medical_sorting_prompt(files_info, chunked=False):
+    """Create a textbook-based prompt for DeepSeek API.
+    With chunked=True the model places each file in a section instead of
+    returning one sorted list (see sort_in_chunks)."""
     
     prompt = f"""You are a medical education expert specializing in pediatric surgery curriculum design.
 
@@ -74,32 +179,83 @@ Sort these {len(files_info)} pediatric surgery MCQ files according to STANDARD P
    - TRANSPLANTATION (liver, kidney, intestine)
 
 File details to sort:
-{json.dumps(files_info, indent=2)}
+{orjson.dumps(files_info, option=orjson.OPT_INDENT_2).decode()}
 
 Return ONLY a JSON object:
 {{"sorted_files": ["mcq_json/01_filename.json", "mcq_json/02_filename.json", ...]}}"""
     
+    if chunked:
+        prompt = prompt.rsplit("Return ONLY", 1)[0] + f"""Return ONLY a JSON object with one entry per file:
+{{"files": [{{"filename": "01_filename.json", "section": "HEAD & NECK", "sub_order": 1}}, ...]}}
+"section" is exactly one of: {", ".join(SECTIONS)}
+"sub_order" is the file's position within its section in textbook order."""
+    
     return prompt
 
-def sort_with_deepseek_api(files_info, api_key, base_url="https://api.deepseek.com"):
-    """Use DeepSeek API to intelligently sort based on medical content."""
+def ask_deepseek(client, prompt):
+    """Send one sorting prompt and return the parsed JSON reply."""
+    response = client.chat.completions.create(
+        model="deepseek-chat",
+        messages=[
+            {"role": "system", "content": "Medical curriculum design expert. Return only JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.1,
+        response_format={"type": "json_object"}
+    )
+    return orjson.loads(response.choices[0].message.content)
+
+def place_chunk(client, chunk):
+    """(section index, sub_order, path) for each file of one chunk. If the
+    request fails the chunk keeps its filename order after all sections, so
+    the other chunks are still placed."""
+    try:
+        result = ask_deepseek(client, prepare_medical_sorting_prompt(chunk, chunked=True))
+        paths = {info["filename"]: info["path"] for info in chunk}
+        placed = []
+        for entry in result.get("files", []):
+            path = paths.pop(Path(str(entry.get("filename", ""))).name, None)
+            if path is None:
+                continue
+            try:
+                sub_order = int(entry.get("sub_order", 0))
+            except (TypeError, ValueError):
+                sub_order = 0
+            placed.append((_SECTION_INDEX.get(entry.get("section"), len(SECTIONS)), sub_order, path))
+        # files the reply left out go after all sections, validate_sorting style
+        placed.extend((len(SECTIONS), 0, path) for path in paths.values())
+        return placed
+    except Exception as e:
+        print(f"⚠️  API Error on a chunk: {e}")
+        print("📉 Falling back to filename-based sorting for that chunk...")
+        return [(len(SECTIONS), i, path) for i, path in enumerate(fallback_sort(chunk))]
+
+def sort_in_chunks(client, files_info, chunk_size):
+    """Place chunk_size files per request, concurrently, then merge by section.
+    sub_orders only compare within one request, so inside a section each
+    chunk's files stay together as a block, in chunk order."""
+    chunks = [files_info[i:i + chunk_size] for i in range(0, len(files_info), chunk_size)]
+    print(f"🤖 Analyzing medical content with DeepSeek API ({len(chunks)} chunks of up to {chunk_size} files)...")
+    with ThreadPoolExecutor(max_workers=CHUNK_WORKERS) as ex:
+        placed = [(section, chunk_no, sub_order, path)
+                  for chunk_no, chunk in enumerate(ex.map(lambda chunk: place_chunk(client, chunk), chunks))
+                  for section, sub_order, path in chunk]
+    placed.sort(key=lambda entry: entry[:3])  # stable, so equal keys keep the reply's order
+    return [path for _, _, _, path in placed]
+
+def sort_with_deepseek_api(files_info, api_key, base_url="https://api.deepseek.com", chunk_size=0):
+    """Use DeepSeek API to intelligently sort based on medical content.
+    With chunk_size, folders larger than that are sorted by sort_in_chunks."""
     client = OpenAI(api_key=api_key, base_url=base_url)
     
+    if chunk_size and len(files_info) > chunk_size:
+        return sort_in_chunks(client, files_info, chunk_size)
+    
     prompt = prepare_medical_sorting_prompt(files_info)
     
     try:
         print("🤖 Analyzing medical content with DeepSeek API...")
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "Medical curriculum design expert. Return only JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
+        result = ask_deepseek(client, prompt)
         return result.get("sorted_files", [])
         
     except Exception as e:
@@ -116,15 +272,17 @@ def validate_sorting(sorted_files, files_info):
     """Ensure all files are included in sorted list."""
     original_files = {info["filename"]: info["path"] for info in files_info}
     validated = []
+    validated_names = set()
     
     for file_path in sorted_files:
         filename = Path(file_path).name
         if filename in original_files:
             validated.append(original_files[filename])
+            validated_names.add(filename)
     
     # Add any missing files
     if len(validated) != len(files_info):
-        missing = set(original_files.keys()) - set(Path(p).name for p in validated)
+        missing = [filename for filename in original_files if filename not in validated_names]
         for filename in missing:
             validated.append(original_files[filename])
             print(f"⚠️  Added missing file: {filename}")
@@ -136,9 +294,9 @@ def generate_order_file(sorted_files, output_folder, output_name="order.txt"):
     order_file_path = Path(output_folder) / output_name
     
     with open(order_file_path, 'w') as f:
-        for index, file_path in enumerate(sorted_files, start=1):
-            filename = Path(file_path).name
-            f.write(f"{index:02d}_{filename}\n")
+        # one write for the whole file
+        f.write("".join([f"{index:02d}_{Path(file_path).name}\n"
+                         for index, file_path in enumerate(sorted_files, start=1)]))
     
     return order_file_path
 
@@ -151,6 +309,9 @@ def main():
     parser.add_argument("--folder", default="E:\\kindle\\orderJsonFIles", help="Root folder")
     parser.add_argument("--output", default="order.txt", help="Output filename")
     parser.add_argument("--base-url", default="https://api.deepseek.com", help="API base URL")
+    parser.add_argument("--no-cache", action="store_true", help="Re-read every JSON file, ignoring the cache")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="Sort in chunks of this many files (e.g. 50) when the folder is too big for one request")
     
     args = parser.parse_args()
     
@@ -176,11 +337,7 @@ def main():
     json_files = list(mcq_folder.glob("*.json"))
     print(f"📁 Found {len(json_files)} JSON files")
     
-    files_info = []
-    for json_file in json_files:
-        info = read_json_file(json_file)
-        if info:
-            files_info.append(info)
+    files_info = read_json_files(json_files, None if args.no_cache else root_folder / INFO_CACHE)
     
     if not files_info:
         print("❌ No valid files could be read")
@@ -195,7 +352,7 @@ def main():
     
     # AI sorting
     print("\n" + "="*70)
-    sorted_files = sort_with_deepseek_api(files_info, api_key, args.base_url)
+    sorted_files = sort_with_deepseek_api(files_info, api_key, args.base_url, args.chunk_size)
     final_files = validate_sorting(sorted_files, files_info)
     
     # Generate order file
@@ -206,11 +363,12 @@ def main():
     print(f"📊 Total files sorted: {len(final_files)}")
     
     # Preview
+    disease_by_name = {f["filename"]: f["disease"] for f in files_info}
     print(f"\n🎯 Top 15 sorted files:")
     print("-" * 80)
     for i, file_path in enumerate(final_files[:15], 1):
         filename = Path(file_path).name
-        disease = next(f["disease"] for f in files_info if f["filename"] == filename)
+        disease = disease_by_name[filename]
         print(f"{i:03d}. {filename:<60} → {disease}")
 
 if __name__ == "__main__":